@@ -0,0 +1,102 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from build import output_path, render_page, select_pages
+from linkindex import extract_references
+from output import write_output
+
+# Pages waiting between two stages. A full queue stops the stage in front
+# of it, so a slow disk holds back reading instead of piling up rendered
+# pages in memory.
+QUEUE_SIZE = 32
+# Reads and writes in flight at once.
+IO_CONCURRENCY = 8
+
+def read_source(path):
+    with open(path, encoding="utf-8") as source_file:
+        stat = os.fstat(source_file.fileno())
+        return (stat.st_mtime_ns, stat.st_size), source_file.read()
+
+def render_source(source, cache_dir = None, collect_references = False):
+    errors = []
+    html = render_page(source, cache_dir, errors=errors)
+    return html, extract_references(source) if collect_references else None, errors
+
+# Runs the stage coroutine count times, then tells the next stage there is
+# nothing more by putting one None per consumer on its queue.
+async def run_stage(stage, count, queue, consumers):
+    await asyncio.gather(*(stage() for _ in range(count)))
+    for _ in range(consumers):
+        await queue.put(None)
+
+# Same result as build, but reading sources, rendering and writing output
+# overlap: io_concurrency readers feed a bounded queue, workers render pages
+# in an executor (processes, or one thread when workers is 1) and
+# io_concurrency writers save the results. Unchanged outputs are not
+# rewritten. errors, when given, gets the unpaired delimiters as build
+# reports them, in page order.
+async def build_async(content_dir, out_dir, workers = None, cache_dir = None, index_path = None,
+        io_concurrency = IO_CONCURRENCY, queue_size = QUEUE_SIZE, errors = None):
+    workers = workers or os.cpu_count() or 1
+    index, paths = select_pages(content_dir, out_dir, index_path)
+    collect_references = index is not None
+    loop = asyncio.get_running_loop()
+    io_executor = ThreadPoolExecutor(max_workers=io_concurrency)
+    render_executor = ThreadPoolExecutor(max_workers=1) if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    pending = iter(paths)
+    read_queue = asyncio.Queue(queue_size)
+    write_queue = asyncio.Queue(queue_size)
+    references = {}
+    found = {}
+
+    async def read():
+        # Every reader pulls from the same iterator, so each path is read once.
+        for path in pending:
+            stamp, source = await loop.run_in_executor(io_executor, read_source, os.path.join(content_dir, path))
+            await read_queue.put((path, stamp, source))
+
+    async def render():
+        while True:
+            item = await read_queue.get()
+            if item is None:
+                return
+            path, stamp, source = item
+            html, page_references, page_errors = await loop.run_in_executor(render_executor, render_source, source,
+                cache_dir, collect_references)
+            if collect_references:
+                references[path] = (stamp, *page_references)
+            if page_errors:
+                found[path] = page_errors
+            await write_queue.put((path, html))
+
+    async def write():
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            path, html = item
+            await loop.run_in_executor(io_executor, write_output, os.path.join(out_dir, output_path(path)), html)
+
+    stages = [
+        asyncio.ensure_future(run_stage(read, io_concurrency, read_queue, workers)),
+        asyncio.ensure_future(run_stage(render, workers, write_queue, io_concurrency)),
+        *(asyncio.ensure_future(write()) for _ in range(io_concurrency)),
+    ]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        # After a failure the other stages would wait on their queues forever.
+        for stage in stages:
+            stage.cancel()
+        await asyncio.gather(*stages, return_exceptions=True)
+        io_executor.shutdown()
+        render_executor.shutdown()
+
+    if index is not None:
+        for page in paths:
+            index.update(page, *references[page])
+        index.save(index_path)
+    if errors is not None:
+        errors.extend((page, *error) for page in paths for error in found.get(page, ()))
+    return [output_path(path) for path in paths]
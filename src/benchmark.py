@@ -0,0 +1,360 @@
+import argparse
+import compileall
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from corpus import make_nested_tree, make_site
+from flatdoc import FlatDocument
+from htmlnode import LeafNode, ParentNode, escape_text
+from markdown import split_nodes_image, split_nodes_link, markdown_to_blocks, block_to_block_type, \
+    text_to_textnodes, markdown_to_html, markdown_to_html_node, BlockType
+from search import SearchCollector, extract_search_entry
+from sourcemap import render_with_source_map
+from textnode import TextNode, TextType
+
+SEED = 1234
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def time_call(function, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_split_many_urls():
+    results = {}
+    counts = (100, 200, 400, 800, 1600, 3200)
+    cases = [
+        ("split_nodes_link", split_nodes_link, "[link {0}](https://example.com/{0})"),
+        ("split_nodes_image", split_nodes_image, "![image {0}](https://example.com/{0}.png)"),
+    ]
+    for name, function, template in cases:
+        print(name)
+        for count in counts:
+            text = " and ".join(template.format(i) for i in range(count))
+            elapsed = time_call(function, [TextNode(text, TextType.TEXT)])
+            print(f"  {count:>5} urls: {elapsed * 1000:9.3f} ms  {elapsed / count * 1e6:7.3f} us/url")
+            results[f"{name}/{count}"] = elapsed
+    return results
+
+# Dict-backed stand-ins with the same attributes, used as the "before"
+# figure when reporting how much the __slots__ node classes save.
+class DictTextNode:
+    def __init__(self, text, text_type, url = None):
+        self.text = text
+        self.text_type = text_type
+        self.url = url
+
+class DictLeafNode:
+    def __init__(self, tag, value, props = None):
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props
+
+def bytes_per_node(factory, count=100_000):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    nodes = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the nodes is not part of the per-node cost.
+    return (after - before - sys.getsizeof(nodes)) / count
+
+def bench_node_memory():
+    results = {}
+    text = "shared text"
+    cases = [
+        ("TextNode", lambda i: DictTextNode(text, TextType.TEXT), lambda i: TextNode(text, TextType.TEXT)),
+        ("LeafNode", lambda i: DictLeafNode("b", text), lambda i: LeafNode("b", text)),
+    ]
+    for name, before_factory, after_factory in cases:
+        before = bytes_per_node(before_factory)
+        after = bytes_per_node(after_factory)
+        print(f"{name}: {before:6.1f} bytes/node with __dict__, {after:6.1f} bytes/node with __slots__")
+        results[f"{name}/bytes_per_node"] = after
+    return results
+
+# Each scenario varies one dimension of the synthetic corpus and keeps the
+# make_document defaults for the rest.
+PIPELINE_SCENARIOS = [
+    ("paragraph_words=50", {"paragraph_words": 50}),
+    ("paragraph_words=500", {"paragraph_words": 500}),
+    ("paragraph_words=5000", {"paragraph_words": 5000, "paragraphs": 2}),
+    ("link_density=0", {"link_density": 0.0}),
+    ("link_density=0.2", {"link_density": 0.2}),
+    ("link_density=0.5", {"link_density": 0.5}),
+    ("list_items=10", {"list_items": 10}),
+    ("list_items=100", {"list_items": 100}),
+    ("list_items=1000", {"list_items": 1000, "paragraphs": 2}),
+    ("pages=10", {"pages": 10}),
+    ("pages=100", {"pages": 100}),
+    ("pages=400", {"pages": 400}),
+]
+NESTING_DEPTHS = (10, 100, 1000)
+DEFAULT_PAGES = 20
+
+def time_pipeline_stages(documents, repeat = 3):
+    blocks = [block for document in documents for block in markdown_to_blocks(document)]
+    inline_blocks = [block for block in blocks if block_to_block_type(block) != BlockType.CODE]
+    trees = [markdown_to_html_node(document) for document in documents]
+    stages = {
+        "markdown_to_blocks": lambda: [markdown_to_blocks(document) for document in documents],
+        "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+        "text_to_textnodes": lambda: [text_to_textnodes(block) for block in inline_blocks],
+        "to_html": lambda: [tree.to_html() for tree in trees],
+    }
+    return {stage: time_call(function, repeat=repeat) for stage, function in stages.items()}
+
+def bench_pipeline():
+    results = {}
+    for name, options in PIPELINE_SCENARIOS:
+        options = dict(options)
+        pages = options.pop("pages", DEFAULT_PAGES)
+        documents = make_site(SEED, pages, **options)
+        timings = time_pipeline_stages(documents)
+        size = sum(len(document) for document in documents)
+        print(f"{name} ({size / 1024:.0f} KiB)")
+        for stage, elapsed in timings.items():
+            print(f"  {stage:<20} {elapsed * 1000:9.3f} ms  {elapsed / size * 1e9:7.2f} ns/byte")
+            results[f"{name}/{stage}"] = elapsed
+
+    for depth in NESTING_DEPTHS:
+        tree = make_nested_tree(depth)
+        elapsed = time_call(tree.to_html)
+        print(f"nesting_depth={depth}\n  {'to_html':<20} {elapsed * 1000:9.3f} ms")
+        results[f"nesting_depth={depth}/to_html"] = elapsed
+    return results
+
+# The if/elif chain TextNode.to_html_node used before it dispatched through
+# TEXT_TO_HTML_NODE, kept as the reference for the span_conversion figures.
+def if_chain_to_html_node(node):
+    if node.text_type == TextType.TEXT:
+        return LeafNode(None, node.text)
+    elif node.text_type == TextType.BOLD:
+        return LeafNode("b", node.text)
+    elif node.text_type == TextType.ITALIC:
+        return LeafNode("i", node.text)
+    elif node.text_type == TextType.CODE:
+        return LeafNode("code", node.text)
+    elif node.text_type == TextType.LINK:
+        return LeafNode("a", node.text, {"href": node.url})
+    elif node.text_type == TextType.IMAGE:
+        return LeafNode("img", "", {"src": node.url, "alt": node.text})
+    else:
+        raise Exception(f'Unexpected text type: {node.text_type}')
+
+def bench_span_conversion():
+    results = {}
+    documents = make_site(SEED, DEFAULT_PAGES, link_density=0.2)
+    spans = [node for document in documents for block in markdown_to_blocks(document) for node in text_to_textnodes(block)
+        if block_to_block_type(block) != BlockType.CODE]
+    # Mostly plain text spans reach the end of the old chain quickly, so
+    # also time the link and image spans that were checked last.
+    url_spans = [node for node in spans if node.url is not None]
+    for name, nodes in (("all_spans", spans), ("url_spans", url_spans)):
+        before = time_call(lambda: [if_chain_to_html_node(node) for node in nodes])
+        after = time_call(lambda: [node.to_html_node() for node in nodes])
+        print(f"{name} ({len(nodes)}): {before / len(nodes) * 1e9:7.1f} ns/span with if/elif, {after / len(nodes) * 1e9:7.1f} ns/span with dispatch table")
+        results[f"{name}/ns_per_span"] = after / len(nodes) * 1e9
+    return results
+
+def peak_bytes(function, *args):
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+# Parsing plus serializing each page through the HTMLNode tree and through
+# the flat arrays, and the peak memory each needs to hold a parsed page.
+def bench_flat_document():
+    results = {}
+    documents = make_site(SEED, DEFAULT_PAGES, link_density=0.2, list_items=50)
+    size = sum(len(document) for document in documents)
+    cases = [
+        ("node_tree", markdown_to_html_node, lambda tree: tree.to_html()),
+        ("flat_document", FlatDocument, lambda document: document.to_html()),
+    ]
+    print(f"{len(documents)} pages ({size / 1024:.0f} KiB)")
+    for name, parse, serialize in cases:
+        parse_time = time_call(lambda: [parse(document) for document in documents])
+        parsed = [parse(document) for document in documents]
+        html_time = time_call(lambda: [serialize(page) for page in parsed])
+        peak = max(peak_bytes(parse, document) for document in documents)
+        print(f"  {name:<14} parse {parse_time * 1000:8.3f} ms  to_html {html_time * 1000:8.3f} ms  peak {peak / 1024:8.1f} KiB/page")
+        results[f"{name}/parse"] = parse_time
+        results[f"{name}/to_html"] = html_time
+        results[f"{name}/peak_bytes"] = peak
+    return results
+
+# Escaping cost per string with and without characters to replace, and the
+# cost of rendering the same trees again once their props are serialized.
+def bench_escaping():
+    results = {}
+    plain = [f"plain text number {i}" for i in range(10_000)]
+    special = [f"a < b && c > {i}" for i in range(10_000)]
+    for name, strings in (("plain", plain), ("special", special)):
+        elapsed = time_call(lambda: [escape_text(text) for text in strings])
+        print(f"escape_text {name:<8} {elapsed / len(strings) * 1e9:7.1f} ns/string")
+        results[f"escape_text/{name}/ns_per_string"] = elapsed / len(strings) * 1e9
+
+    documents = make_site(SEED, DEFAULT_PAGES, link_density=0.5)
+    first = time_call(lambda: [markdown_to_html_node(document).to_html() for document in documents], repeat=1)
+    trees = [markdown_to_html_node(document) for document in documents]
+    [tree.to_html() for tree in trees]
+    again = time_call(lambda: [tree.to_html() for tree in trees])
+    print(f"build and render {first * 1000:8.3f} ms, render again {again * 1000:8.3f} ms")
+    results["rerender"] = again
+    return results
+
+# Cost of keeping source maps on: plain rendering against rendering with a
+# map, and looking up a position per block.
+def bench_source_map():
+    results = {}
+    documents = make_site(SEED, DEFAULT_PAGES, link_density=0.5)
+    plain = time_call(lambda: [markdown_to_html(document) for document in documents])
+    mapped = time_call(lambda: [render_with_source_map(document) for document in documents])
+    print(f"markdown_to_html {plain * 1000:8.3f} ms, with source map {mapped * 1000:8.3f} ms "
+        f"({(mapped / plain - 1) * 100:+.1f}%)")
+    results["plain"] = plain
+    results["source_map"] = mapped
+    return results
+
+# Rendering with a search collector next to rendering alone, and the
+# separate extraction used for pages that do not render.
+def bench_search():
+    documents = make_site(SEED, DEFAULT_PAGES, link_density=0.5)
+    render = time_call(lambda: [markdown_to_html(document) for document in documents])
+    collect = time_call(lambda: [markdown_to_html(document, search=SearchCollector()) for document in documents])
+    extract = time_call(lambda: [extract_search_entry(document) for document in documents])
+    print(f"markdown_to_html {render * 1000:8.3f} ms, collecting search {collect * 1000:8.3f} ms "
+        f"({(collect / render - 1) * 100:+.1f}%), extract_search_entry {extract * 1000:8.3f} ms "
+        f"({extract / render * 100:.1f}% of render)")
+    return {"render": render, "collect": collect, "extract": extract}
+
+# One page around a long generated code listing with blank lines.
+def bench_code_listing(lines = 50_000):
+    code = "\n".join(f"    value_{i} = compute(a < b, {i})" if i % 7 else "" for i in range(lines))
+    document = f"# Listing\n\nIntro.\n\n```python\n{code}\n```\n\nAfter."
+    results = {}
+    for name, render in (("markdown_to_html", markdown_to_html), ("flat_document", lambda page: FlatDocument(page).to_html())):
+        elapsed = time_call(lambda: render(document))
+        print(f"{lines} line listing {name:<18} {elapsed * 1000:8.3f} ms, peak {peak_bytes(render, document) / 1e6:6.2f} MB")
+        results[f"{name}/seconds"] = elapsed
+    return results
+
+def run_process(args, env):
+    subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL)
+
+# Wall time of whole interpreter processes, the cost a CI step that renders
+# one page pays. "source" compiles every module on each start, as with
+# PYTHONDONTWRITEBYTECODE or a read-only checkout; "precompiled" reads
+# bytecode produced ahead of time with compileall.
+def bench_startup():
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pairs = []
+        for i, document in enumerate(make_site(SEED, DEFAULT_PAGES)):
+            source_path = os.path.join(temp_dir, f"page{i}.md")
+            with open(source_path, "w") as page_file:
+                page_file.write(document)
+            pairs.append((source_path, os.path.join(temp_dir, f"page{i}.html")))
+
+        # Fresh copies of the modules, one left as plain source and one
+        # compiled into its own __pycache__.
+        ignore = shutil.ignore_patterns("__pycache__", "test_*")
+        module_dirs = {
+            "source": shutil.copytree(SRC_DIR, os.path.join(temp_dir, "source"), ignore=ignore),
+            "precompiled": shutil.copytree(SRC_DIR, os.path.join(temp_dir, "precompiled"), ignore=ignore),
+        }
+        compileall.compile_dir(module_dirs["precompiled"], quiet=1)
+        base_env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        base_env.pop("PYTHONPYCACHEPREFIX", None)
+
+        for variant, module_dir in module_dirs.items():
+            env = dict(base_env, PYTHONPATH=module_dir)
+            commands = {
+                "interpreter": [sys.executable, "-c", "pass"],
+                "import_markdown": [sys.executable, "-c", "import markdown"],
+                "render_one": [sys.executable, os.path.join(module_dir, "main.py"), "render", *pairs[0]],
+            }
+            for name, args in commands.items():
+                elapsed = time_call(lambda: run_process(args, env))
+                print(f"{variant:<12} {name:<16} {elapsed * 1000:8.1f} ms")
+                results[f"{variant}/{name}"] = elapsed
+
+        # Many pages through one process instead of one process per page.
+        main = [sys.executable, os.path.join(module_dirs["precompiled"], "main.py"), "render"]
+        separate = time_call(lambda: [run_process(main + list(pair), env) for pair in pairs], repeat=3)
+        batch = time_call(lambda: run_process(main + [path for pair in pairs for path in pair], env), repeat=3)
+        print(f"{len(pairs)} pages: {separate * 1000:8.1f} ms as separate processes, {batch * 1000:8.1f} ms in one render batch")
+        results["render_separate"] = separate
+        results["render_batch"] = batch
+    return results
+
+BENCHMARKS = {
+    "split_urls": bench_split_many_urls,
+    "node_memory": bench_node_memory,
+    "pipeline": bench_pipeline,
+    "span_conversion": bench_span_conversion,
+    "flat_document": bench_flat_document,
+    "escaping": bench_escaping,
+    "source_map": bench_source_map,
+    "search": bench_search,
+    "code_listing": bench_code_listing,
+    "startup": bench_startup,
+}
+
+# Every metric is a time or a size, so a ratio above the threshold against
+# the baseline is a regression.
+def compare_results(current, baseline, threshold):
+    regressions = []
+    for metric, value in sorted(current.items()):
+        previous = baseline.get(metric)
+        if previous and value / previous > threshold:
+            regressions.append((metric, previous, value, value / previous))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark the markdown to html pipeline.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--output", help="write results as json to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --output")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+    for name in args.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        for metric, value in BENCHMARKS[name]().items():
+            results[f"{name}/{metric}"] = value
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"python": platform.python_version(), "seed": SEED, "results": results}, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare_results(results, baseline, args.threshold)
+        for metric, previous, value, ratio in regressions:
+            print(f"REGRESSION {metric}: {previous:.6g} -> {value:.6g} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.2f}x against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import os
+
+from cache import RenderCache
+from linkindex import LinkIndex, extract_references
+from markdown import BlockCache, markdown_to_html, write_markdown_html
+from output import STREAM_BYTES, stream_output, write_output
+from profiling import Profiler
+from search import SearchCollector, SearchIndex, extract_search_entry
+from sourcemap import LineIndex, line_positions, render_with_source_map, source_map_json, source_map_path
+from template import TemplateCache, extract_title
+
+# Upper bound on the markdown bytes handed to a worker in one task. Small
+# pages are grouped so each task is worth the pickling round trip.
+BATCH_BYTES = 256 * 1024
+
+# Directory under the output that holds the search index shards.
+SEARCH_DIR = "search"
+
+# Per-process state reused by every batch a worker renders.
+worker_block_cache = None
+worker_render_caches = {}
+worker_templates = TemplateCache()
+
+def find_markdown_files(content_dir):
+    paths = []
+    for root, dirs, files in os.walk(content_dir):
+        for name in files:
+            if name.endswith(".md"):
+                paths.append(os.path.relpath(os.path.join(root, name), content_dir))
+    return sorted(paths)
+
+def output_path(relative_path):
+    return os.path.splitext(relative_path)[0] + ".html"
+
+def make_batches(content_dir, paths, workers, batch_bytes = BATCH_BYTES):
+    sizes = [os.path.getsize(os.path.join(content_dir, path)) for path in paths]
+    # Aim for several batches per worker so a few large pages cannot leave
+    # the other workers idle at the end of the build.
+    target = max(1, min(batch_bytes, sum(sizes) // (workers * 4)))
+    batches = []
+    current = []
+    current_bytes = 0
+    for path, size in zip(paths, sizes):
+        current.append(path)
+        current_bytes += size
+        if current_bytes >= target:
+            batches.append(current)
+            current = []
+            current_bytes = 0
+    if current:
+        batches.append(current)
+    return batches
+
+def get_worker_block_cache():
+    global worker_block_cache
+    if worker_block_cache is None:
+        worker_block_cache = BlockCache()
+    return worker_block_cache
+
+# Unpaired delimiters go to errors, when given, as (line, column, message).
+# A search collector (see search.SearchCollector) reads the page as it
+# renders; it reads nothing when the render cache already has the page.
+def render_page(source, cache_dir = None, path = None, profiler = None, errors = None, search = None):
+    block_cache = get_worker_block_cache()
+    inline_errors = None if errors is None else []
+    render = lambda page: markdown_to_html(page, block_cache, inline_errors, profiler, path or "<string>", search)
+    if cache_dir is None:
+        html = render(source)
+    else:
+        render_cache = worker_render_caches.get(cache_dir)
+        if render_cache is None:
+            render_cache = worker_render_caches[cache_dir] = RenderCache(cache_dir)
+        html = render_cache.render(source, render, inline_errors)
+    if inline_errors:
+        index = LineIndex(source)
+        errors.extend((*index.position(error.offset), error.message) for error in inline_errors)
+    return html
+
+# Writes a page's html to destination, or with a template the template's
+# chunks with the page's title and html in their slots, straight into the
+# output file.
+def write_page(destination, source, html, template = None):
+    if template is None:
+        return write_output(destination, html)
+    title = extract_title(source)
+    return stream_output(destination, lambda write: template.render(write, title, lambda write_content: write_content(html)))
+
+# Renders a source of more than STREAM_BYTES from its file to destination
+# block by block (see write_markdown_html), so neither the markdown nor the
+# html is held whole. References are read in a further pass over the file;
+# they grow with the page, the rendering does not. The search entry is
+# collected while the page renders, or read in a further pass when the
+# template has no content slot. Returns the source's stamp, its references
+# and its search entry, the last two None unless asked for. With a
+# template the title is read in a first pass and the body is streamed
+# into the content slot. Unpaired
+# delimiters go to errors as render_page reports them, placed on their
+# lines by one more pass when there are any. A profiler times the page as
+# path.
+def stream_page(source_path, destination, collect_references = False, collect_search = False, template = None,
+        errors = None, profiler = None, path = None):
+    inline_errors = None if errors is None else []
+    search = None
+    with open(source_path, encoding="utf-8") as source_file:
+        stat = os.fstat(source_file.fileno())
+
+        def write_content(write):
+            nonlocal search
+            source_file.seek(0)
+            if inline_errors:
+                inline_errors.clear()
+            if collect_search:
+                search = SearchCollector()
+            write_markdown_html(source_file, write, get_worker_block_cache(), inline_errors, profiler,
+                path or source_path, search)
+
+        if template is None:
+            stream_output(destination, write_content)
+        else:
+            title = extract_title(source_file)
+            stream_output(destination, lambda write: template.render(write, title, write_content))
+        if inline_errors:
+            source_file.seek(0)
+            positions = line_positions(source_file, [error.offset for error in inline_errors])
+            errors.extend((*position, error.message) for position, error in zip(positions, inline_errors))
+    page_references = entry = None
+    if collect_references:
+        with open(source_path, encoding="utf-8") as source_file:
+            page_references = extract_references(source_file)
+    if search is not None:
+        entry = search.entry()
+    elif collect_search:
+        with open(source_path, encoding="utf-8") as source_file:
+            entry = extract_search_entry(source_file)
+    return (stat.st_mtime_ns, stat.st_size), page_references, entry
+
+# With source_maps every page is rendered afresh, without the render cache
+# or the profiler, and its source map is written next to it. With
+# collect_search the page's search entry is collected as the page renders,
+# and read from its source when it did not render here (a render cache
+# hit or a source map). Pages over STREAM_BYTES are streamed (see
+# stream_page), except for source maps, which need the whole source. With
+# a template_path every page is written through that template, compiled
+# once per worker and again only when it changes (see TemplateCache), and
+# the source map offsets count from the start of the page. Pages with
+# unpaired delimiters are returned with their (line, column, message)s.
+def render_batch(content_dir, out_dir, paths, cache_dir = None, profile = False, collect_references = False,
+        source_maps = False, collect_search = False, template_path = None):
+    profiler = Profiler() if profile else None
+    template = None if template_path is None else worker_templates.get(template_path)
+    written = []
+    references = {}
+    search_entries = {}
+    page_errors = {}
+    for path in paths:
+        source_path = os.path.join(content_dir, path)
+        destination = os.path.join(out_dir, output_path(path))
+        errors = []
+        if not source_maps and os.path.getsize(source_path) > STREAM_BYTES:
+            stamp, page_references, entry = stream_page(source_path, destination, collect_references, collect_search,
+                template, errors, profiler, path)
+            written.append(output_path(path))
+            if errors:
+                page_errors[path] = errors
+            if collect_references:
+                references[path] = (stamp, *page_references)
+            if collect_search:
+                search_entries[path] = entry
+            continue
+
+        with open(source_path, encoding="utf-8") as source_file:
+            stat = os.fstat(source_file.fileno())
+            source = source_file.read()
+        search = SearchCollector() if collect_search and not source_maps else None
+        if source_maps:
+            html, source_map = render_with_source_map(source, path.replace(os.sep, "/"))
+            if template is not None:
+                offset = template.content_offset(extract_title(source))
+                for block in source_map["blocks"]:
+                    block["html"] = [block["html"][0] + offset, block["html"][1] + offset]
+            write_output(source_map_path(destination), source_map_json(source_map))
+            errors = [(error["line"], error["column"], error["message"]) for error in source_map["errors"]]
+        else:
+            html = render_page(source, cache_dir, path, profiler, errors, search)
+        write_page(destination, source, html, template)
+        written.append(output_path(path))
+        if errors:
+            page_errors[path] = errors
+        if collect_references:
+            references[path] = ((stat.st_mtime_ns, stat.st_size), *extract_references(source))
+        if collect_search:
+            search_entries[path] = search.entry() if search is not None and search.blocks else extract_search_entry(source)
+    return written, references, profiler, search_entries, page_errors
+
+# Returns the link index (None without an index_path) and the pages to
+# render. With an index only pages whose source changed since it was saved,
+# or whose output is missing, are rendered, and the outputs of deleted
+# sources are removed. includes maps the files every page is built with
+# (a template and its partials) to their mtime_ns: pages built with other
+# includes, or with one that changed since, are rendered again too.
+def select_pages(content_dir, out_dir, index_path = None, includes = None):
+    paths = find_markdown_files(content_dir)
+    if index_path is None:
+        return None, paths
+    index = LinkIndex.load(index_path)
+    for page in set(index.pages) - set(paths):
+        index.remove(page)
+        destination = os.path.join(out_dir, output_path(page))
+        for stale_output in (destination, source_map_path(destination)):
+            if os.path.exists(stale_output):
+                os.remove(stale_output)
+    includes = includes or {}
+    stale = index.stale_pages(content_dir, paths, index.changed_includes(includes))
+    stale.update(page for page, entry in index.pages.items() if sorted(entry["includes"]) != sorted(includes))
+    return index, [path for path in paths
+        if path in stale or not os.path.exists(os.path.join(out_dir, output_path(path)))]
+
+# Brings the search index in line with the content after the rendered
+# pages' entries were added: entries of deleted sources are dropped, and
+# pages the index has never seen (it may be newer than the link index)
+# are read here. Then the changed shards are written to out_dir/search.
+def update_search_index(search, content_dir, out_dir):
+    paths = find_markdown_files(content_dir)
+    for page in set(search.pages) - set(paths):
+        search.remove(page)
+    for page in paths:
+        if page not in search.pages:
+            with open(os.path.join(content_dir, page), encoding="utf-8") as source_file:
+                search.update(page, extract_search_entry(source_file.read()))
+    search.write_shards(os.path.join(out_dir, SEARCH_DIR))
+
+# With an index_path the build is incremental (see select_pages), and the
+# index is updated with the rendered pages' references and saved. With
+# source_maps each page gets a .map file (see render_with_source_map). With
+# a search_path the search index kept there is updated from the rendered
+# pages and its shards are written (see update_search_index). With a
+# template_path pages are written through that template (see Template).
+# Unpaired delimiters in the rendered pages are added to errors, when
+# given, as (page, line, column, message) in page order.
+def build(content_dir, out_dir, workers = None, cache_dir = None, profiler = None, index_path = None,
+        source_maps = False, search_path = None, template_path = None, errors = None):
+    workers = workers or os.cpu_count() or 1
+    # Compiled here first so a broken template fails the build before any
+    # page is written, and so the index knows which files it was read from.
+    includes = {} if template_path is None else worker_templates.get(template_path).dependencies
+    index, paths = select_pages(content_dir, out_dir, index_path, includes)
+    search = None if search_path is None else SearchIndex.load(search_path)
+
+    batches = make_batches(content_dir, paths, workers)
+    profile = profiler is not None
+    collect_references = index is not None
+    collect_search = search is not None
+
+    if workers == 1 or len(batches) <= 1:
+        results = [render_batch(content_dir, out_dir, batch, cache_dir, profile, collect_references, source_maps,
+            collect_search, template_path) for batch in batches]
+    else:
+        # Imported here: it is slow to import and only a parallel build needs it.
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            count = len(batches)
+            results = list(executor.map(render_batch, [content_dir] * count, [out_dir] * count, batches,
+                [cache_dir] * count, [profile] * count, [collect_references] * count, [source_maps] * count,
+                [collect_search] * count, [template_path] * count))
+
+    for _, references, batch_profiler, search_entries, page_errors in results:
+        if profile:
+            profiler.merge(batch_profiler)
+        if errors is not None:
+            errors.extend((page, *error) for page, found in page_errors.items() for error in found)
+        for page, (stamp, links, images) in references.items():
+            index.update(page, stamp, links, images, includes)
+        for page, entry in search_entries.items():
+            search.update(page, entry)
+    if index is not None:
+        index.include_stamps.update(includes)
+        index.save(index_path)
+    if search is not None:
+        update_search_index(search, content_dir, out_dir)
+        search.save(search_path)
+    # executor.map keeps submission order, so the result is the sorted source
+    # order no matter which worker finished first.
+    return [path for written, *_ in results for path in written]
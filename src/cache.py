@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from markdown import LazyPattern, markdown_to_html
+
+# Bump when rendered output changes in a way the module sources below do
+# not capture (for example a change in a dependency's behaviour).
+GENERATOR_VERSION = "1"
+RENDER_MODULES = ("markdown.py", "textnode.py", "htmlnode.py")
+
+def code_fingerprint():
+    digest = hashlib.sha256(GENERATOR_VERSION.encode())
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in RENDER_MODULES:
+        with open(os.path.join(directory, name), "rb") as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+# Written into every version directory, so only directories this cache
+# made are ever removed as old versions.
+CACHE_MARKER = "render-cache"
+VERSION_PATTERN = LazyPattern(r"[0-9a-f]{16}")
+# Bytes a process may add before it looks at the whole directory again.
+RESCAN_FRACTION = 8
+
+def source_key(source):
+    return hashlib.sha256(source.encode()).hexdigest()
+
+# On-disk cache of rendered pages keyed by the hash of their source. Entries
+# live in a subdirectory named after the generator version, which covers the
+# render modules' code and an optional salt (e.g. a template hash), and
+# opening a cache with a new version removes the entries of every other one
+# (directories holding CACHE_MARKER only). The cache is trimmed to
+# max_bytes, evicting least recently used entries. Every build worker has a
+# RenderCache of its own on the same directory, so a process counts the
+# whole directory again when it is over max_bytes or has added a
+# RESCAN_FRACTION of it since it last looked; together the workers overshoot
+# by at most that much each.
+class RenderCache:
+    def __init__(self, cache_dir, max_bytes = 256 * 1024 * 1024, salt = ""):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = hashlib.sha256((code_fingerprint() + salt).encode()).hexdigest()[:16]
+        self.directory = os.path.join(cache_dir, self.version)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.added_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        open(os.path.join(self.directory, CACHE_MARKER), "a").close()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != self.version and VERSION_PATTERN.fullmatch(name) and os.path.isfile(os.path.join(path, CACHE_MARKER)):
+                shutil.rmtree(path, ignore_errors=True)
+        self.scan()
+        self.evict(self.max_bytes)
+
+    # Reads the entries of every process from the directory, least recently
+    # used first.
+    def scan(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".html"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime_ns, entry.name[:-5], stat.st_size))
+        self.entries = OrderedDict((key, size) for _, key, size in sorted(found))
+        self.total_bytes = sum(self.entries.values())
+        self.added_bytes = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.html")
+
+    def get(self, source):
+        key = source_key(source)
+        try:
+            with open(self.path(key), encoding="utf-8") as cached:
+                html = cached.read()
+        except FileNotFoundError:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        # Recency is kept in the file's mtime so it survives restarts and is
+        # seen by other processes. Another worker may have evicted the
+        # entry since it was read.
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            self.entries.pop(key, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        return html
+
+    def put(self, source, html):
+        key = source_key(source)
+        data = html.encode()
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, self.path(key))
+
+        self.total_bytes += len(data) - self.entries.pop(key, 0)
+        self.added_bytes += len(data)
+        self.entries[key] = len(data)
+        if self.total_bytes > self.max_bytes or self.added_bytes > self.max_bytes // RESCAN_FRACTION:
+            self.scan()
+            if self.total_bytes > self.max_bytes:
+                # Trimmed with room to spare, so a full cache is not scanned
+                # again on every put.
+                self.evict(self.max_bytes - self.max_bytes // RESCAN_FRACTION)
+
+    def evict(self, limit):
+        while self.total_bytes > limit and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    # With errors, render is expected to report to it, and a page that
+    # reported anything is not cached, so a hit has nothing to report.
+    def render(self, source, render = markdown_to_html, errors = None):
+        html = self.get(source)
+        if html is None:
+            reported = 0 if errors is None else len(errors)
+            html = render(source)
+            if errors is None or len(errors) == reported:
+                self.put(source, html)
+        return html
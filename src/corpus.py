@@ -0,0 +1,77 @@
+import random
+
+from htmlnode import LeafNode, ParentNode
+
+# Reproducible synthetic markdown for benchmarks. Every generator takes a
+# random.Random so the same seed always produces the same corpus.
+
+WORDS = (
+    "static site generator markdown block inline node render parse html "
+    "page index link image list quote heading code paragraph text bold "
+    "italic build cache token stream output source content template"
+).split()
+
+def make_words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+def make_paragraph(rng, words, link_density = 0.0):
+    parts = []
+    for i in range(words):
+        word = rng.choice(WORDS)
+        roll = rng.random()
+        if roll < link_density:
+            word = f"[{word}](https://example.com/{word}/{i})"
+        elif roll < link_density + 0.03:
+            word = f"**{word}**"
+        elif roll < link_density + 0.06:
+            word = f"_{word}_"
+        elif roll < link_density + 0.08:
+            word = f"`{word}`"
+        parts.append(word)
+    return " ".join(parts)
+
+def make_list(rng, items, ordered = False, link_density = 0.0):
+    lines = []
+    for i in range(items):
+        marker = f"{i + 1}." if ordered else "-"
+        lines.append(f"{marker} {make_paragraph(rng, 8, link_density)}")
+    return "\n".join(lines)
+
+def make_document(rng, paragraphs = 10, paragraph_words = 60, link_density = 0.05, list_items = 5):
+    blocks = [f"# {make_words(rng, 4)}"]
+    for i in range(paragraphs):
+        blocks.append(make_paragraph(rng, paragraph_words, link_density))
+        if i % 3 == 0:
+            blocks.append(f"## {make_words(rng, 3)}")
+        if i % 4 == 1:
+            blocks.append(make_list(rng, list_items, ordered=i % 8 == 1, link_density=link_density))
+        if i % 5 == 2:
+            blocks.append(f"> {make_paragraph(rng, 20)}")
+        if i % 7 == 3:
+            blocks.append(f"```\n{make_words(rng, 12)}\n{make_words(rng, 12)}\n```")
+    return "\n\n".join(blocks) + "\n"
+
+def make_site(seed, pages, **document_options):
+    rng = random.Random(seed)
+    return [make_document(rng, **document_options) for _ in range(pages)]
+
+# The lines of one document of at least size characters, made lazily from
+# make_document pages one after another, so a document larger than memory
+# can be rendered from it.
+def iter_large_document_lines(seed, size, **document_options):
+    rng = random.Random(seed)
+    total = 0
+    while total < size:
+        document = make_document(rng, **document_options)
+        total += len(document) + 1
+        yield from document.splitlines(keepends=True)
+        yield "\n"
+
+# Markdown in this generator cannot nest blocks, so the nesting dimension
+# is exercised on an html tree directly.
+def make_nested_tree(depth, width = 2):
+    node = ParentNode("p", [LeafNode("b", "deep"), LeafNode(None, " text")])
+    for level in range(depth):
+        siblings = [LeafNode("span", f"sibling {level}.{i}") for i in range(width - 1)]
+        node = ParentNode("div", [node, *siblings], {"class": f"level-{level}"})
+    return node
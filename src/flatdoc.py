@@ -0,0 +1,355 @@
+import io
+from array import array
+from bisect import bisect_right
+
+from htmlnode import escape_attribute, escape_text
+from markdown import BlockType, FencedCode, LazyPattern, block_lines_to_block_type, iter_inline_spans, \
+    iter_markdown_block_offsets
+from textnode import TextNode, TextType
+
+# Flat, array-backed alternative to lists of TextNodes and HTMLNode trees.
+# Parsing records offsets into the source string only; substrings and
+# TextNode objects are created lazily when a caller asks for them, and the
+# html serializer writes straight from the arrays.
+#
+# Blocks own a run of lines, lines own a run of spans:
+#   block_types[b]        code of the block's BlockType
+#   block_lines[b]        index of its first line (plus a final sentinel)
+#   line_starts/ends[l]   offsets of the line's content, markers removed
+#   source_starts/ends[l] offsets of the whole stripped line, markers kept
+#   line_spans[l]         index of its first span (plus a final sentinel)
+#   span_types[s]         code of the span's TextType
+#   span_starts/ends[s]   offsets of the span's text
+#   span_urls[s]          index into url_starts/url_ends, or -1
+#
+# The inline markup of a block is resolved over the same text
+# markdown_to_html resolves: the contents of its lines joined by a
+# separator (see markdown.block_inline_texts), one text per list item. Its
+# offsets are moved back to the source, so a span belongs to the line it
+# starts on and may run on across line breaks; span_text puts the
+# separator back in their place. Blocks and their lines are those of
+# markdown.iter_markdown_block_offsets. A code block has three lines: its
+# opening fence, the code as one opaque slice of the source, however many
+# lines it spans, and its closing fence (empty when there is none).
+#
+# The flat counterpart of markdown_to_blocks and text_to_textnodes is a
+# FlatDocument of the whole source: block_text gives the blocks and
+# iter_text_nodes the TextNodes of each.
+
+TEXT_TYPES = list(TextType)
+TEXT_TYPE_CODES = {text_type: code for code, text_type in enumerate(TEXT_TYPES)}
+BLOCK_TYPES = list(BlockType)
+BLOCK_TYPE_CODES = {block_type: code for code, block_type in enumerate(BLOCK_TYPES)}
+
+TEXT = TEXT_TYPE_CODES[TextType.TEXT]
+BOLD = TEXT_TYPE_CODES[TextType.BOLD]
+ITALIC = TEXT_TYPE_CODES[TextType.ITALIC]
+CODE = TEXT_TYPE_CODES[TextType.CODE]
+LINK = TEXT_TYPE_CODES[TextType.LINK]
+IMAGE = TEXT_TYPE_CODES[TextType.IMAGE]
+BOLD_ITALIC = TEXT_TYPE_CODES[TextType.BOLD_ITALIC]
+# Opening and closing tags around a run of text of each emphasis.
+TAGS = {TEXT: ("", ""), BOLD: ("<b>", "</b>"), ITALIC: ("<i>", "</i>"), BOLD_ITALIC: ("<b><i>", "</i></b>")}
+
+HEADING_MARKER = LazyPattern(r"(#+)\s*")
+QUOTE_MARKER = LazyPattern(r">*\s*")
+ORDERED_MARKER = LazyPattern(r"\d+\.\s*")
+
+BLOCK_TAGS = {
+    BlockType.PARAGRAPH: "p",
+    BlockType.QUOTE: "blockquote",
+    BlockType.UNORDERED_LIST: "ul",
+    BlockType.ORDERED_LIST: "ol",
+}
+LIST_TYPES = (BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST)
+# Separator the string-based renderer puts between the lines of a block.
+SEPARATORS = {BlockType.PARAGRAPH: " ", BlockType.QUOTE: " ", BlockType.HEADING: "\n"}
+
+class FlatDocument:
+    def __init__(self, source):
+        self.source = source
+        self.block_types = array("b")
+        self.block_lines = array("q")
+        self.line_starts = array("q")
+        self.line_ends = array("q")
+        self.source_starts = array("q")
+        self.source_ends = array("q")
+        self.line_spans = array("q")
+        self.span_types = array("b")
+        self.span_starts = array("q")
+        self.span_ends = array("q")
+        self.span_urls = array("q")
+        self.url_starts = array("q")
+        self.url_ends = array("q")
+        # InlineErrors for unpaired delimiters, with offsets into source.
+        self.errors = []
+        self.parse()
+
+    def __len__(self):
+        return len(self.block_types)
+
+    def parse(self):
+        for lines, starts in iter_markdown_block_offsets(self.source):
+            if isinstance(lines, FencedCode):
+                self.add_code_block(lines)
+            else:
+                self.add_block(lines, starts)
+        self.block_lines.append(len(self.line_starts))
+        self.line_spans.append(len(self.span_types))
+
+    # Every line of the block is added once, in order, so the whole lines
+    # are recorded up front.
+    def add_block(self, lines, starts):
+        source = self.source
+        block_type = block_lines_to_block_type(lines)
+        ends = [start + len(line) for start, line in zip(starts, lines)]
+        self.block_types.append(BLOCK_TYPE_CODES[block_type])
+        self.block_lines.append(len(self.line_starts))
+        self.source_starts.extend(starts)
+        self.source_ends.extend(ends)
+
+        if block_type == BlockType.HEADING:
+            starts[0] = HEADING_MARKER.match(source, starts[0], ends[0]).end()
+        elif block_type == BlockType.QUOTE:
+            starts = [QUOTE_MARKER.match(source, start, end).end() for start, end in zip(starts, ends)]
+        elif block_type == BlockType.UNORDERED_LIST:
+            starts = [start + 2 for start in starts]
+        elif block_type == BlockType.ORDERED_LIST:
+            starts = [ORDERED_MARKER.match(source, start, end).end() for start, end in zip(starts, ends)]
+
+        if block_type in LIST_TYPES:
+            # Every list item is a text of its own.
+            for start, end in zip(starts, ends):
+                self.tokenize_text([start], [end], "")
+        elif block_type == BlockType.HEADING and len(starts) > 1 and starts[0] == ends[0]:
+            # The heading text is stripped, so a bare "#" line adds nothing.
+            self.add_line(starts[0], ends[0])
+            self.tokenize_text(starts[1:], ends[1:], SEPARATORS[block_type])
+        else:
+            self.tokenize_text(starts, ends, SEPARATORS[block_type])
+
+    def add_code_block(self, code):
+        self.block_types.append(BLOCK_TYPE_CODES[BlockType.CODE])
+        self.block_lines.append(len(self.line_starts))
+        closing_start = code.block_end - len(code[1]) if len(code) > 1 else code.block_end
+        for start, end in ((code.block_start, code.block_start + len(code[0])), (code.start, code.end),
+                (closing_start, code.block_end)):
+            self.add_line(start, end)
+            self.source_starts.append(start)
+            self.source_ends.append(end)
+
+    def add_line(self, start, end):
+        self.line_starts.append(start)
+        self.line_ends.append(end)
+        self.line_spans.append(len(self.span_types))
+
+    def add_span(self, text_type, start, end, url = -1):
+        self.span_types.append(text_type)
+        self.span_starts.append(start)
+        self.span_ends.append(end)
+        self.span_urls.append(url)
+
+    def add_url(self, start, end):
+        self.url_starts.append(start)
+        self.url_ends.append(end)
+        return len(self.url_starts) - 1
+
+    # Resolves inline markup with markdown.iter_inline_spans over the
+    # lines [start, end) joined by separator, and records the spans and
+    # errors at their offsets in the source. An offset in the joined text
+    # is on the last line starting at or before it; the separator after a
+    # line stands for everything up to the next line's start.
+    def tokenize_text(self, starts, ends, separator):
+        source = self.source
+        if len(starts) == 1:
+            text = source
+            ranges = ((starts[0], ends[0]),)
+            text_starts = [starts[0]]
+        else:
+            text = separator.join([source[start:end] for start, end in zip(starts, ends)])
+            ranges = ((0, len(text)),)
+            text_starts = []
+            offset = 0
+            for start, end in zip(starts, ends):
+                text_starts.append(offset)
+                offset += end - start + len(separator)
+
+        def to_source(offset):
+            line = bisect_right(text_starts, offset) - 1
+            return starts[line] + offset - text_starts[line]
+
+        line = 0
+        self.add_line(starts[0], ends[0])
+        errors = []
+        for text_type, start, end, url_start, url_end in iter_inline_spans(text, ranges, errors):
+            start = to_source(start)
+            while line + 1 < len(starts) and start >= starts[line + 1]:
+                line += 1
+                self.add_line(starts[line], ends[line])
+            url = -1 if url_start < 0 else self.add_url(to_source(url_start), to_source(url_end))
+            self.add_span(TEXT_TYPE_CODES[text_type], start, to_source(end), url)
+        while line + 1 < len(starts):
+            line += 1
+            self.add_line(starts[line], ends[line])
+        for error in errors:
+            error.offset = to_source(error.offset)
+        self.errors.extend(errors)
+
+    def block_type(self, block):
+        return BLOCK_TYPES[self.block_types[block]]
+
+    def block_line_range(self, block):
+        return range(self.block_lines[block], self.block_lines[block + 1])
+
+    # Offsets of the block's first and past its last character, markers
+    # included.
+    def block_span(self, block):
+        return self.source_starts[self.block_lines[block]], self.source_ends[self.block_lines[block + 1] - 1]
+
+    # The block as markdown_to_blocks returns it.
+    def block_text(self, block):
+        source = self.source
+        if self.block_type(block) == BlockType.CODE:
+            return source[slice(*self.block_span(block))]
+        return "\n".join(source[self.source_starts[line]:self.source_ends[line]] for line in self.block_line_range(block))
+
+    def code_text(self, block):
+        line = self.block_lines[block] + 1
+        return self.source[self.line_starts[line]:self.line_ends[line]]
+
+    # The text between two source offsets of a block's inline text, with
+    # the separator in place of each line break it runs across.
+    def text_between(self, start, end):
+        line = bisect_right(self.line_starts, start) - 1
+        line_end = self.line_ends[line]
+        if end <= line_end:
+            return self.source[start:end]
+        separator = SEPARATORS[self.block_type(bisect_right(self.block_lines, line) - 1)]
+        pieces = []
+        while end > line_end:
+            pieces.append(self.source[start:line_end])
+            pieces.append(separator)
+            line += 1
+            start = self.line_starts[line]
+            line_end = self.line_ends[line]
+        pieces.append(self.source[start:end])
+        return "".join(pieces)
+
+    def span_text(self, span):
+        return self.text_between(self.span_starts[span], self.span_ends[span])
+
+    def span_url(self, span):
+        url = self.span_urls[span]
+        return None if url < 0 else self.text_between(self.url_starts[url], self.url_ends[url])
+
+    # Each entry is the lines of one text that was tokenized on its own:
+    # the whole block, or a single list item.
+    def text_units(self, block):
+        lines = self.block_line_range(block)
+        if self.block_type(block) in LIST_TYPES:
+            return [(line, line + 1) for line in lines]
+        return [(lines.start, lines.stop)]
+
+    # Groups the spans of lines [first_line, last_line) the way
+    # text_to_textnodes joins them: consecutive text of the same emphasis
+    # is one group. Yields ("text", type, spans) and ("span", index) for
+    # code, link and image spans.
+    def iter_text_groups(self, first_line, last_line):
+        span_types = self.span_types
+        span_urls = self.span_urls
+        group = None
+        for span in range(self.line_spans[first_line], self.line_spans[last_line]):
+            span_type = span_types[span]
+            if span_urls[span] >= 0 or span_type == CODE:
+                if group is not None:
+                    yield group
+                    group = None
+                yield ("span", span)
+            elif group is not None and group[1] == span_type:
+                group[2].append(span)
+            else:
+                if group is not None:
+                    yield group
+                group = ("text", span_type, [span])
+        if group is not None:
+            yield group
+
+    def group_text(self, spans):
+        return "".join(self.span_text(span) for span in spans)
+
+    # Offsets from the first to the last source character of a group.
+    def group_span(self, spans):
+        return self.span_starts[spans[0]], self.span_ends[spans[-1]]
+
+    # TextNodes for a block, created on demand, with their source spans.
+    # List blocks yield the nodes of each item in turn; a code block yields
+    # one CODE node.
+    def iter_text_nodes(self, block):
+        if self.block_type(block) == BlockType.CODE:
+            line = self.block_lines[block] + 1
+            yield TextNode(self.code_text(block), TextType.CODE, span=(self.line_starts[line], self.line_ends[line]))
+            return
+        for first_line, last_line in self.text_units(block):
+            for group in self.iter_text_groups(first_line, last_line):
+                if group[0] == "text":
+                    yield TextNode(self.group_text(group[2]), TEXT_TYPES[group[1]], span=self.group_span(group[2]))
+                else:
+                    span = group[1]
+                    yield TextNode(self.span_text(span), TEXT_TYPES[self.span_types[span]], self.span_url(span),
+                        (self.span_starts[span], self.span_ends[span]))
+
+    def iter_text_html(self, first_line, last_line):
+        for group in self.iter_text_groups(first_line, last_line):
+            if group[0] == "text":
+                open_tag, close_tag = TAGS[group[1]]
+                yield open_tag
+                for span in group[2]:
+                    yield escape_text(self.span_text(span))
+                yield close_tag
+                continue
+
+            span = group[1]
+            span_type = self.span_types[span]
+            text = self.span_text(span)
+            if span_type == CODE:
+                yield f"<code>{escape_text(text)}</code>"
+            elif span_type == LINK:
+                yield f'<a href="{escape_attribute(self.span_url(span))}">{escape_text(text)}</a>'
+            else:
+                yield f'<img src="{escape_attribute(self.span_url(span))}" alt="{escape_attribute(text)}"></img>'
+
+    def iter_block_html(self, block):
+        block_type = self.block_type(block)
+        if block_type == BlockType.CODE:
+            yield "<pre><code>"
+            yield escape_text(self.code_text(block))
+            yield "</code></pre>"
+            return
+
+        if block_type == BlockType.HEADING:
+            start = self.source_starts[self.block_lines[block]]
+            tag = f"h{min(len(HEADING_MARKER.match(self.source, start).group(1)), 6)}"
+        else:
+            tag = BLOCK_TAGS[block_type]
+        yield f"<{tag}>"
+        for first_line, last_line in self.text_units(block):
+            if block_type in LIST_TYPES:
+                yield "<li>"
+            yield from self.iter_text_html(first_line, last_line)
+            if block_type in LIST_TYPES:
+                yield "</li>"
+        yield f"</{tag}>"
+
+    def iter_html(self):
+        yield "<div>"
+        for block in range(len(self)):
+            yield from self.iter_block_html(block)
+        yield "</div>"
+
+    def write_html(self, sink):
+        sink.writelines(self.iter_html())
+
+    def to_html(self):
+        sink = io.StringIO()
+        self.write_html(sink)
+        return sink.getvalue()
@@ -1,23 +1,106 @@
+# Most text has nothing to escape, so the "in" checks let it through
+# without building a new string.
+def escape_text(text):
+    if "&" not in text and "<" not in text and ">" not in text:
+        return text
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+# Values that are not strings are written as str() gives them.
+def escape_attribute(value):
+    value = str(value)
+    if "&" not in value and "<" not in value and ">" not in value and '"' not in value:
+        return value
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+# The props of a node: a dict that cannot be changed in place, so the
+# html a node caches for them (see HTMLNode.tag_props_html) cannot go
+# stale. Assign new props to the node instead.
+class FrozenProps(dict):
+    __slots__ = ()
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError("props cannot be changed in place, assign new props to the node")
+
+    __setitem__ = __delitem__ = __ior__ = clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self):
+        return FrozenProps, (dict(self),)
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props_dict", "props_html")
+
     def __init__(self, tag = None, value = None, children = None, props = None):
         self.tag = tag
         self.value = value
         self.children = children
         self.props = props
 
+    @property
+    def props(self):
+        return self.props_dict
+
+    # Setting props copies them into FrozenProps and drops the cached html.
+    @props.setter
+    def props(self, props):
+        self.props_dict = FrozenProps(props) if props else props
+        self.props_html = None
+
     def to_html(self):
         raise NotImplementedError
+
+    def html_parts(self):
+        raise NotImplementedError
+
+    def iter_html(self):
+        # Walks the tree with an explicit stack instead of recursing, so deep
+        # trees neither hit the recursion limit nor copy each subtree's html
+        # into its parent's string. Entries are either html chunks or nodes
+        # that still need to be expanded.
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                yield item
+            else:
+                parts = item.html_parts()
+                parts.reverse()
+                stack.extend(parts)
+
+    def write_html(self, sink):
+        sink.writelines(self.iter_html())
+
+    def count_nodes(self):
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if node.children:
+                stack.extend(node.children)
+        return count
     
     def props_to_html(self):
-        if not self.props:
-            return ""
-        props = map(lambda item: f'{item[0]}="{item[1]}"', self.props.items())
-        return " ".join(props)
+        return self.tag_props_html()[1:]
+
+    # The props as they go inside the opening tag, with a leading space.
+    # Serialized once per node and again only after props are set.
+    def tag_props_html(self):
+        props_html = self.props_html
+        if props_html is None:
+            props = self.props_dict
+            if props:
+                props_html = "".join(f' {name}="{escape_attribute(value)}"' for name, value in props.items())
+            else:
+                props_html = ""
+            self.props_html = props_html
+        return props_html
     
     def __repr__(self) -> str:
         return f'HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})'
     
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props = None):
         super().__init__(tag, value, None, props)
 
@@ -26,26 +109,27 @@ class LeafNode(HTMLNode):
             raise ValueError("LeafNode.value cannot be None")
         
         if self.tag is None:
-            return self.value
+            return escape_text(self.value)
         
-        props = self.props_to_html()
-        if len(props) > 1:
-            props = " " + props
-        return f'<{self.tag}{props}>{self.value}</{self.tag}>'
+        return f'<{self.tag}{self.tag_props_html()}>{escape_text(self.value)}</{self.tag}>'
+
+    def html_parts(self):
+        return [self.to_html()]
     
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
     def to_html(self):
+        return "".join(self.iter_html())
+
+    def html_parts(self):
         if self.tag is None:
             raise ValueError("ParentNode.tag cannot be None")
         
         if not self.children:
             raise ValueError("ParentNode must have children")
         
-        children_html = "".join(map(lambda child: child.to_html(), self.children))
-        props = self.props_to_html()
-        if len(props) > 1:
-            props = " " + props
-        return f'<{self.tag}{props}>{children_html}</{self.tag}>'
+        return [f'<{self.tag}{self.tag_props_html()}>', *self.children, f'</{self.tag}>']
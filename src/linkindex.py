@@ -0,0 +1,152 @@
+import json
+import os
+import posixpath
+from urllib.parse import urlsplit
+
+from markdown import INLINE_PATTERN, BlockType, block_inline_texts, block_lines_to_block_type, \
+    iter_markdown_block_lines
+
+# The urls of the links and images markdown renders, found by the inline
+# scanner the renderer uses (INLINE_PATTERN) in the texts it renders, so a
+# "[x](y)" in a code span or after an escaped bracket is not a reference.
+# Links do not depend on emphasis, so the scan alone decides them; one
+# without a url renders as text and is skipped. Blocks without "](" cannot
+# hold one and are not scanned.
+def extract_references(markdown):
+    links = []
+    images = []
+    for lines in iter_markdown_block_lines(markdown):
+        block_type = block_lines_to_block_type(lines)
+        if block_type == BlockType.CODE:
+            continue
+        block = "\n".join(lines)
+        if "](" not in block:
+            continue
+        for text in block_inline_texts(block, block_type, lines):
+            if "](" not in text:
+                continue
+            for match in INLINE_PATTERN.finditer(text):
+                kind = match.lastgroup
+                if kind == "link_url" and match.group(kind):
+                    links.append(match.group(kind))
+                elif kind == "image_url" and match.group(kind):
+                    images.append(match.group(kind))
+    return links, images
+
+def page_url_path(page):
+    return posixpath.splitext(page.replace(os.sep, "/"))[0] + ".html"
+
+# Maps a link found on page to the site path it points at, in the same form
+# as page_url_path, or returns None for external urls and bare fragments.
+def resolve_target(page, url):
+    parsed = urlsplit(url)
+    if parsed.scheme or parsed.netloc or not parsed.path:
+        return None
+    path = parsed.path
+    if path.startswith("/"):
+        target = path.lstrip("/")
+    else:
+        target = posixpath.join(posixpath.dirname(page_url_path(page)), path)
+    target = posixpath.normpath(target) if target else ""
+    if target in ("", ".") or path.endswith("/"):
+        target = posixpath.join("" if target == "." else target, "index.html")
+    root, extension = posixpath.splitext(target)
+    if extension == ".md":
+        target = root + ".html"
+    elif not extension:
+        target += ".html"
+    return target
+
+# Site-wide index of what every page references. pages maps a content path
+# to the stamp (mtime and size) of the source it was built from and its
+# outgoing links, images and includes; referrers maps each resolved target
+# back to the pages that point at it. It is saved as json between builds so
+# unchanged pages are neither re-rendered nor re-parsed. include_stamps
+# holds the mtime_ns each include (a template or partial) had when the
+# pages using it were last built.
+class LinkIndex:
+    def __init__(self):
+        self.pages = {}
+        self.referrers = {}
+        self.include_stamps = {}
+
+    def update(self, page, stamp, links, images, includes = ()):
+        self.remove(page)
+        self.pages[page] = {"stamp": list(stamp), "links": list(links), "images": list(images), "includes": list(includes)}
+        for target in self.targets(page):
+            self.referrers.setdefault(target, set()).add(page)
+
+    def remove(self, page):
+        if page not in self.pages:
+            return
+        for target in self.targets(page):
+            referrers = self.referrers.get(target)
+            if referrers is not None:
+                referrers.discard(page)
+                if not referrers:
+                    del self.referrers[target]
+        del self.pages[page]
+
+    def targets(self, page):
+        entry = self.pages[page]
+        targets = set(entry["includes"])
+        for url in entry["links"] + entry["images"]:
+            target = resolve_target(page, url)
+            if target is not None:
+                targets.add(target)
+        return targets
+
+    def dependents(self, target):
+        return sorted(self.referrers.get(target, ()))
+
+    # Includes whose mtime_ns in stamps differs from the one recorded.
+    def changed_includes(self, stamps):
+        return [include for include, stamp in stamps.items() if self.include_stamps.get(include) != stamp]
+
+    def stale_pages(self, content_dir, pages, changed_includes = ()):
+        stale = set()
+        for page in pages:
+            entry = self.pages.get(page)
+            if entry is None or entry["stamp"] != list(source_stamp(content_dir, page)):
+                stale.add(page)
+        for include in changed_includes:
+            stale.update(page for page in self.dependents(include) if page in pages)
+        return stale
+
+    def broken_links(self, static_dir = None):
+        existing = {page_url_path(page) for page in self.pages}
+        includes = {include for entry in self.pages.values() for include in entry["includes"]}
+        broken = []
+        for target in sorted(self.referrers):
+            if target in existing or target in includes:
+                continue
+            if static_dir is not None and os.path.isfile(os.path.join(static_dir, target)):
+                continue
+            broken.extend((page, target) for page in sorted(self.referrers[target]))
+        return broken
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as index_file:
+            json.dump({"pages": self.pages, "include_stamps": self.include_stamps}, index_file, sort_keys=True)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        try:
+            with open(path) as index_file:
+                data = json.load(index_file)
+        except FileNotFoundError:
+            return index
+        index.include_stamps = data.get("include_stamps", {})
+        for page, entry in data["pages"].items():
+            index.update(page, entry["stamp"], entry["links"], entry["images"], entry["includes"])
+        return index
+
+def source_stamp(content_dir, page):
+    stat = os.stat(os.path.join(content_dir, page))
+    return stat.st_mtime_ns, stat.st_size
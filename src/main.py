@@ -1,8 +1,130 @@
-from textnode import TextNode, TextType
+import argparse
+import os
+import sys
 
-def main():
-    text_node = TextNode("This is some anchor text", TextType.LINK, "https://www.boot.dev")
-    print(text_node)
+# Every command imports what it needs when it runs, so a one-page render
+# does not load asyncio, the http server or the process pool.
 
+# Reads "input<TAB>output" lines, one pair per line, from a file or "-" for
+# stdin.
+def read_pairs(path):
+    pairs_file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        pairs = []
+        for line in pairs_file:
+            line = line.rstrip("\n")
+            if line:
+                source, destination = line.split("\t")
+                pairs.append((source, destination))
+        return pairs
+    finally:
+        if pairs_file is not sys.stdin:
+            pairs_file.close()
 
-main()
\ No newline at end of file
+# Sources over STREAM_BYTES are streamed block by block to their output.
+# Unpaired delimiters are printed to stderr.
+def render_pairs(pairs):
+    from markdown import BlockCache, markdown_to_html, write_markdown_html
+    from output import STREAM_BYTES, stream_output, write_output
+    from sourcemap import format_error, line_positions
+
+    block_cache = BlockCache()
+    for source_path, destination in pairs:
+        errors = []
+        with open(source_path, encoding="utf-8") as source_file:
+            if os.fstat(source_file.fileno()).st_size > STREAM_BYTES:
+                stream_output(destination, lambda write: write_markdown_html(source_file, write, block_cache, errors))
+            else:
+                write_output(destination, markdown_to_html(source_file.read(), block_cache, errors))
+            positions = []
+            if errors:
+                source_file.seek(0)
+                positions = line_positions(source_file, [error.offset for error in errors])
+        for (line, column), error in zip(positions, errors):
+            print(format_error(source_path, line, column, error.message), file=sys.stderr)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Build a static site from markdown.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="render every markdown file in a directory")
+    build_parser.add_argument("content_dir", nargs="?", default="content")
+    build_parser.add_argument("out_dir", nargs="?", default="public")
+    build_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: cpu count)")
+    build_parser.add_argument("--cache-dir", default=None, help="reuse rendered pages from this directory")
+    build_parser.add_argument("--profile", action="store_true", help="print per-stage timings and the slowest pages and blocks")
+    build_parser.add_argument("--index", default=None, help="link index file; rebuild only pages changed since it was saved")
+    build_parser.add_argument("--async-io", action="store_true", help="overlap reading, rendering and writing pages")
+    build_parser.add_argument("--io-concurrency", type=int, default=None,
+        help="reads and writes in flight with --async-io (default: 8)")
+    build_parser.add_argument("--source-maps", action="store_true",
+        help="write a .map file linking each page's html elements to markdown lines")
+    build_parser.add_argument("--search-index", default=None,
+        help="search index file; update it from the rendered pages and write its shards to OUT_DIR/search")
+    build_parser.add_argument("--template", default=None,
+        help="html file with {{ title }} and {{ content }} slots and {{> partial }} includes to wrap every page in")
+
+    render_parser = commands.add_parser("render", help="render markdown files to the given html files in one process")
+    render_parser.add_argument("paths", nargs="*", metavar="INPUT OUTPUT", help="pairs of markdown input and html output paths")
+    render_parser.add_argument("--pairs", default=None, help='file of "input<TAB>output" lines, or - for stdin')
+
+    serve_parser = commands.add_parser("serve", help="build, then serve the output with live reload")
+    serve_parser.add_argument("content_dir", nargs="?", default="content")
+    serve_parser.add_argument("out_dir", nargs="?", default="public")
+    serve_parser.add_argument("--watch", action="store_true", help="re-render pages as their sources change")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes for the initial build")
+    serve_parser.add_argument("--template", default=None, help="page template, as for build")
+
+    check_parser = commands.add_parser("check", help="report links to pages or files that do not exist")
+    check_parser.add_argument("index", help="link index written by build --index")
+    check_parser.add_argument("--static-dir", default=None, help="directory of non-page files links may point at")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        errors = []
+        if args.async_io and args.profile:
+            parser.error("--profile is not supported with --async-io")
+        if args.async_io and (args.source_maps or args.search_index or args.template):
+            parser.error("--source-maps, --search-index and --template are not supported with --async-io")
+        if args.async_io:
+            import asyncio
+            from asyncbuild import IO_CONCURRENCY, build_async
+            profiler = None
+            written = asyncio.run(build_async(args.content_dir, args.out_dir, workers=args.jobs, cache_dir=args.cache_dir,
+                index_path=args.index, io_concurrency=args.io_concurrency or IO_CONCURRENCY, errors=errors))
+        else:
+            from build import build
+            from profiling import Profiler
+            profiler = Profiler() if args.profile else None
+            written = build(args.content_dir, args.out_dir, workers=args.jobs, cache_dir=args.cache_dir, profiler=profiler,
+                index_path=args.index, source_maps=args.source_maps, search_path=args.search_index,
+                template_path=args.template, errors=errors)
+        from sourcemap import format_error
+        for page, line, column, message in errors:
+            print(format_error(os.path.join(args.content_dir, page), line, column, message), file=sys.stderr)
+        print(f"Wrote {len(written)} pages to {args.out_dir}")
+        if profiler is not None:
+            print(profiler.report())
+    elif args.command == "render":
+        if len(args.paths) % 2:
+            parser.error("render takes pairs of input and output paths")
+        pairs = list(zip(args.paths[::2], args.paths[1::2]))
+        if args.pairs is not None:
+            pairs.extend(read_pairs(args.pairs))
+        render_pairs(pairs)
+    elif args.command == "serve":
+        from server import serve
+        serve(args.content_dir, args.out_dir, args.host, args.port, watch=args.watch, workers=args.jobs,
+            template_path=args.template)
+    elif args.command == "check":
+        from linkindex import LinkIndex
+        broken = LinkIndex.load(args.index).broken_links(args.static_dir)
+        for page, target in broken:
+            print(f"{page}: broken link to {target}")
+        return 1 if broken else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
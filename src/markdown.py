@@ -1,5 +1,8 @@
-import re
+import time
+from bisect import bisect_left
+from collections import OrderedDict
 from enum import Enum
+from htmlnode import LeafNode, ParentNode, escape_text
 from textnode import TextNode, TextType
 
 class BlockType(Enum):
@@ -10,6 +13,37 @@ class BlockType(Enum):
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
 
+    # Identity hash, see TextType.
+    __hash__ = object.__hash__
+
+# Attribute lookups on an Enum class cost several times a global lookup, so
+# the members used per span are bound once here.
+TEXT = TextType.TEXT
+BOLD = TextType.BOLD
+ITALIC = TextType.ITALIC
+CODE = TextType.CODE
+LINK = TextType.LINK
+IMAGE = TextType.IMAGE
+BOLD_ITALIC = TextType.BOLD_ITALIC
+
+# A regular expression that is compiled the first time it is used rather
+# than when the module is imported, so a process that renders one small
+# page, or never reaches a pattern, does not pay for compiling it. After the
+# first lookup the compiled pattern's methods are plain instance attributes.
+class LazyPattern:
+    def __init__(self, pattern, flags = 0):
+        self.pattern = pattern
+        self.flags = flags
+
+    def __getattr__(self, name):
+        compiled = self.__dict__.get("compiled")
+        if compiled is None:
+            import re
+            compiled = self.compiled = re.compile(self.pattern, self.flags)
+            for method in ("match", "fullmatch", "search", "finditer", "findall", "sub", "split"):
+                setattr(self, method, getattr(compiled, method))
+        return getattr(compiled, name)
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     nodes = []
     for old_node in old_nodes:
@@ -27,123 +61,794 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
             raise Exception(f'Encountered unpaired "{delimiter}" delimiter in the following text: "{old_node.text}"')
     return nodes
 
-def split_nodes_url_helper(old_nodes, replaced_text, text, text_type, url):
+def require_url(url):
     if not url:
         raise ValueError('url must be specified')
+    return url
+
+IMAGE_PATTERN = LazyPattern(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = LazyPattern(r"(?<!!)\[(.*?)\]\((.*?)\)")
+
+def extract_markdown_images(text):
+    return IMAGE_PATTERN.findall(text)
+
+def extract_markdown_links(text):
+    return LINK_PATTERN.findall(text)
+
+def split_nodes_url_matches(old_nodes, pattern, text_type):
     nodes = []
     for old_node in old_nodes:
         if old_node.url != None:
             nodes.append(old_node)
             continue
-        parts = old_node.text.split(replaced_text)
-        is_first_time = True
-        for part in parts:
-            if is_first_time:
-                is_first_time = False
+        text = old_node.text
+        position = 0
+        for match in pattern.finditer(text):
+            start, end = match.span()
+            if start > position:
+                nodes.append(TextNode(text[position:start], old_node.text_type))
+            nodes.append(TextNode(match.group(1), text_type, require_url(match.group(2))))
+            position = end
+        if position == 0:
+            nodes.append(old_node)
+        elif position < len(text):
+            nodes.append(TextNode(text[position:], old_node.text_type))
+    return nodes
+
+def split_nodes_image(old_nodes):
+    return split_nodes_url_matches(old_nodes, IMAGE_PATTERN, TextType.IMAGE)
+
+def split_nodes_link(old_nodes):
+    return split_nodes_url_matches(old_nodes, LINK_PATTERN, TextType.LINK)
+
+# Single left-to-right scanner for inline markdown. Each alternative is tried
+# at the current position, so the text is walked once. Code spans are matched
+# whole so their contents are never treated as markup. Alt text and urls
+# cannot contain brackets/parentheses or newlines, which keeps every failed
+# match attempt bounded by the next bracket and the whole scan linear.
+INLINE_PATTERN = LazyPattern(
+    r"`(?P<code>[^`]*)`"
+    r"|!\[(?P<image_alt>[^\[\]\n]*)\]\((?P<image_url>[^()\n]*)\)"
+    r"|\[(?P<link_text>[^\[\]\n]*)\]\((?P<link_url>[^()\n]*)\)"
+    r"|\\(?P<escape>[!-/:-@\[-`{-~])"
+    r"|(?P<delimiter>\*+|_+|`)"
+)
+PUNCTUATION = frozenset("!\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~")
+# Emphasis each delimiter character stands for, and how many characters of
+# a run one level of it uses.
+DELIMITER_MARKS = {"*": (BOLD, 2), "_": (ITALIC, 1)}
+EMPHASIS_TYPES = {(False, False): TEXT, (True, False): BOLD, (False, True): ITALIC, (True, True): BOLD_ITALIC}
+
+# A problem found in inline markup. offset is the position of the offending
+# delimiter in the text that was scanned; the block and document renderers
+# move it to the position in their markdown.
+class InlineError:
+    __slots__ = ("offset", "message")
+
+    def __init__(self, offset, message):
+        self.offset = offset
+        self.message = message
+
+    def __eq__(self, other):
+        if not isinstance(other, InlineError):
+            return NotImplemented
+        return self.offset == other.offset and self.message == other.message
+
+    def __repr__(self):
+        return f'InlineError({self.offset}, {self.message})'
+
+def report_unpaired(errors, offset, delimiter):
+    if errors is not None:
+        errors.append(InlineError(offset, f'Encountered unpaired "{delimiter}" delimiter'))
+
+def report_missing_url(errors, offset, text_type):
+    if errors is not None:
+        errors.append(InlineError(offset, f'{text_type.value.capitalize()} has no url'))
+
+# A run of "*" or "_" characters. Closing consumes characters from the left
+# of the run and opening from the right, so whatever is left between left
+# and right was not used and is kept as literal text.
+class DelimiterRun:
+    __slots__ = ("char", "left", "right", "opens", "closes")
+
+    def __init__(self, char, start, end):
+        self.char = char
+        self.left = start
+        self.right = end
+        self.opens = []
+        self.closes = []
+
+# Left and right flanking as CommonMark defines them, with the ends of the
+# scanned ranges counting as whitespace.
+def is_left_flanking(previous, following):
+    return not following.isspace() and (following not in PUNCTUATION or previous.isspace() or previous in PUNCTUATION)
+
+def is_right_flanking(previous, following):
+    return not previous.isspace() and (previous not in PUNCTUATION or following.isspace() or following in PUNCTUATION)
+
+# Resolves inline markup over text[start:end] for each (start, end) in
+# ranges, the ranges being lines that are joined by whitespace. Emphasis is
+# matched with a delimiter stack per character: a closing run pairs with the
+# nearest open run of the same character, and open runs of the other
+# character in between can no longer close and are dropped. Every delimiter
+# is pushed and popped at most once, so the pass is linear. "_" inside a
+# word and backslash-escaped punctuation are literal text, "**" inside "_"
+# (and the reverse) nests, and delimiters left unpaired are kept as text and
+# reported to errors instead of failing the whole text. There is no "__"
+# emphasis, so a longer run of "_" (__init__) is text, and so is a "_"
+# that ends a word and closes nothing (a_b_). A link or image without a url
+# is kept as text and reported at its "](".
+#
+# Returns the tokens in order: (TEXT, start, end) for text whose emphasis is
+# decided by the runs around it, (text_type, start, end, url_start,
+# url_end) for code, link and image spans, the DelimiterRuns with the
+# emphasis they open and close, and None between two ranges.
+def resolve_inline(text, ranges, errors = None):
+    tokens = []
+    stacks = {"*": [], "_": []}
+    first_range = True
+    for range_start, range_end in ranges:
+        if not first_range:
+            tokens.append(None)
+        first_range = False
+        position = range_start
+        for match in INLINE_PATTERN.finditer(text, range_start, range_end):
+            start = match.start()
+            if start > position:
+                tokens.append((TEXT, position, start))
+            position = match.end()
+
+            kind = match.lastgroup
+            if kind == "delimiter":
+                char = text[start]
+                if char == "`":
+                    report_unpaired(errors, start, char)
+                    tokens.append((TEXT, start, position))
+                    continue
+                if char == "_" and position - start > 1:
+                    tokens.append((TEXT, start, position))
+                    continue
+                previous = text[start - 1] if start > range_start else " "
+                following = text[position] if position < range_end else " "
+                left_flanking = is_left_flanking(previous, following)
+                right_flanking = is_right_flanking(previous, following)
+                if char == "_":
+                    # No emphasis inside words, so snake_case stays as it is.
+                    can_open = left_flanking and (not right_flanking or previous in PUNCTUATION)
+                    can_close = right_flanking and (not left_flanking or following in PUNCTUATION)
+                else:
+                    can_open = left_flanking
+                    can_close = right_flanking
+                run = DelimiterRun(char, start, position)
+                tokens.append(run)
+                mark, size = DELIMITER_MARKS[char]
+                if can_close:
+                    close_run(run, stacks, mark, size, errors)
+                if run.right - run.left >= size:
+                    if can_open:
+                        stacks[char].append(run)
+                    elif can_close and char == "*":
+                        report_unpaired(errors, run.left, char * size)
+            elif kind == "escape":
+                tokens.append((TEXT, start + 1, position))
+            elif kind == "code":
+                code_start, code_end = match.span(kind)
+                if code_end > code_start:
+                    tokens.append((CODE, code_start, code_end, -1, -1))
             else:
-                url_node = TextNode(text, text_type, url)
-                nodes.append(url_node)
-            
-            if part != "":
-                new_node = TextNode(part, old_node.text_type)
-                nodes.append(new_node)
+                url_start, url_end = match.span(kind)
+                text_type = IMAGE if kind == "image_url" else LINK
+                if url_start == url_end:
+                    report_missing_url(errors, url_start - 2, text_type)
+                    tokens.append((TEXT, start, position))
+                else:
+                    tokens.append((text_type, *match.span("image_alt" if text_type is IMAGE else "link_text"),
+                        url_start, url_end))
+        if position < range_end:
+            tokens.append((TEXT, position, range_end))
 
-    return nodes
+    for stack in stacks.values():
+        for run in stack:
+            report_unpaired(errors, run.left, run.char * DELIMITER_MARKS[run.char][1])
 
-def extract_markdown_images(text):
-    regex = r"!\[(.*?)\]\((.*?)\)"
-    matches = re.findall(regex, text)
-    return matches
+    return tokens
 
-def extract_markdown_links(text):
-    regex = r"(?<!!)\[(.*?)\]\((.*?)\)"
-    matches = re.findall(regex, text)
-    return matches
+# Yields (text_type, start, end, url_start, url_end) for every span of
+# resolve_inline's tokens, with url_start -1 when there is no url, and
+# (text_type, -1, -1, -1, -1) between two ranges with the emphasis in
+# effect there.
+def iter_inline_spans(text, ranges, errors = None):
+    bold = 0
+    italic = 0
+    current = TEXT
+    for token in resolve_inline(text, ranges, errors):
+        if token.__class__ is tuple:
+            if token[0] is TEXT:
+                yield (current, token[1], token[2], -1, -1)
+            else:
+                yield token
+        elif token is None:
+            yield (current, -1, -1, -1, -1)
+        else:
+            for mark in token.closes:
+                if mark is BOLD:
+                    bold -= 1
+                else:
+                    italic -= 1
+            current = EMPHASIS_TYPES[bold > 0, italic > 0]
+            if token.right > token.left:
+                yield (current, token.left, token.right, -1, -1)
+            for mark in token.opens:
+                if mark is BOLD:
+                    bold += 1
+                else:
+                    italic += 1
+            current = EMPHASIS_TYPES[bold > 0, italic > 0]
 
-def split_nodes_image(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        images = extract_markdown_images(old_node.text)
-        if not images:
-            new_nodes.append(old_node)
+def close_run(run, stacks, mark, size, errors):
+    stack = stacks[run.char]
+    other = stacks["_" if run.char == "*" else "*"]
+    while stack and run.right - run.left >= size:
+        opener = stack[-1]
+        # Emphasis cannot overlap, so openers of the other kind after this
+        # one are now unpaired.
+        while other and other[-1].left > opener.left:
+            dropped = other.pop()
+            report_unpaired(errors, dropped.left, dropped.char * DELIMITER_MARKS[dropped.char][1])
+        opener.right -= size
+        opener.opens.append(mark)
+        run.left += size
+        run.closes.append(mark)
+        if opener.right - opener.left < size:
+            stack.pop()
+
+# Each node's span is the (start, end) offsets of its text in text, or with
+# origins (see text_origins) in the block, as are the offsets of errors.
+def text_to_textnodes(text, errors = None, origins = None):
+    nodes = []
+    reported = 0 if errors is None else len(errors)
+    # Adjacent text of the same emphasis, e.g. either side of an escape or a
+    # delimiter that was kept as text, is joined into one node.
+    parts = []
+    parts_type = TEXT
+    parts_start = 0
+    parts_end = 0
+    bold = 0
+    italic = 0
+    current = TEXT
+    for token in resolve_inline(text, ((0, len(text)),), errors):
+        if token.__class__ is tuple:
+            if token[0] is TEXT:
+                if current is not parts_type and parts:
+                    nodes.append(TextNode("".join(parts), parts_type, None, (parts_start, parts_end)))
+                    parts = []
+                if not parts:
+                    parts_start = token[1]
+                parts.append(text[token[1]:token[2]])
+                parts_type = current
+                parts_end = token[2]
+                continue
+            if parts:
+                nodes.append(TextNode("".join(parts), parts_type, None, (parts_start, parts_end)))
+                parts = []
+            text_type, start, end, url_start, url_end = token
+            if url_start < 0:
+                nodes.append(TextNode(text[start:end], text_type, None, (start, end)))
+            else:
+                nodes.append(TextNode(text[start:end], text_type, text[url_start:url_end], (start, end)))
             continue
-        current_nodes = [old_node]
-        for image in images:
-            current_nodes = \
-                split_nodes_url_helper(current_nodes,
-                    f'![{image[0]}]({image[1]})',
-                    image[0], 
-                    TextType.IMAGE,
-                    image[1])
-        new_nodes.extend(current_nodes)
-    return new_nodes
 
+        for mark in token.closes:
+            if mark is BOLD:
+                bold -= 1
+            else:
+                italic -= 1
+        current = EMPHASIS_TYPES[bold > 0, italic > 0]
+        if token.right > token.left:
+            if current is not parts_type and parts:
+                nodes.append(TextNode("".join(parts), parts_type, None, (parts_start, parts_end)))
+                parts = []
+            if not parts:
+                parts_start = token.left
+            parts.append(text[token.left:token.right])
+            parts_type = current
+            parts_end = token.right
+        for mark in token.opens:
+            if mark is BOLD:
+                bold += 1
+            else:
+                italic += 1
+        current = EMPHASIS_TYPES[bold > 0, italic > 0]
+    if parts:
+        nodes.append(TextNode("".join(parts), parts_type, None, (parts_start, parts_end)))
 
-def split_nodes_link(old_nodes):
-    new_nodes = []
-    for old_node in old_nodes:
-        links = extract_markdown_links(old_node.text)
-        if not links:
-            new_nodes.append(old_node)
-            continue
-        current_nodes = [old_node]
-        for link in links:
-            current_nodes = \
-                split_nodes_url_helper(current_nodes,
-                    f'[{link[0]}]({link[1]})',
-                    link[0], 
-                    TextType.LINK,
-                    link[1])
-        new_nodes.extend(current_nodes)
-    return new_nodes
-
-def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    if origins is not None:
+        for node in nodes:
+            start, end = node.span
+            node.span = (text_to_block_offset(start, origins), text_to_block_offset(end, origins))
+        if errors is not None:
+            for error in errors[reported:]:
+                error.offset = text_to_block_offset(error.offset, origins)
     return nodes
 
 
-def markdown_to_blocks(markdown):
-    lines = markdown.splitlines()
-    blocks = []
-    current_block = ""
-    isNewBlock = True
+FENCE = "```"
+
+# A fenced code block from iter_markdown_block_lines. As a list it holds
+# the stripped fence lines, so code that classifies blocks or joins their
+# lines keeps working. The code between the fences is never copied: it
+# stays in source between the offsets start and end until code() slices it
+# out for output. Scanning a string, source is that string; scanning other
+# lines, it is the block's own lines joined.
+class FencedCode(list):
+    __slots__ = ("source", "start", "end", "block_start", "block_end")
+
+    def code(self):
+        return self.source[self.start:self.end]
+
+    # The whole block, fences included, as markdown_to_blocks returns it.
+    def text(self):
+        return self.source[self.block_start:self.block_end]
+
+# A fenced code block of the stripped fence lines fence_lines, the first
+# starting at offset fence of source, with its code in [code_start,
+# code_end) and its last fence ending at block_end. Without a block_end
+# the code is unclosed and the block ends with the last text of source.
+def make_fenced_code(fence_lines, source, fence, code_start, code_end, block_end = None):
+    code = FencedCode(fence_lines)
+    code.source = source
+    code.block_start = fence
+    code.start = code_start
+    code.end = code_end
+    if block_end is None:
+        block_end = code_end
+        while block_end > fence + len(fence_lines[0]) and source[block_end - 1].isspace():
+            block_end -= 1
+    code.block_end = block_end
+    return code
+
+# Yields each block as its list of stripped lines, or a FencedCode for a
+# code fence. A fence line ends the block before it. A fence with more
+# after it that also ends in "```" is a code block of its own line;
+# otherwise the code runs to a line of at least as many backticks, or to
+# the end. A string is split as str.splitlines splits it; other iterables
+# of lines are read one line at a time. Either way the blocks are those of
+# iter_markdown_block_offsets.
+def iter_markdown_block_lines(lines):
+    for block_lines, _ in iter_markdown_block_offsets(lines):
+        yield block_lines
+
+# Like iter_markdown_block_lines, but also yields the source offset where
+# each stripped line starts, counted while splitting so positions cost no
+# second pass over the text. A FencedCode comes with the offsets of its
+# fence lines. Offsets into an iterable of lines count the characters of
+# the lines as they are given.
+def iter_markdown_block_offsets(markdown):
+    if isinstance(markdown, str):
+        return iter_lines_block_offsets(markdown.splitlines(keepends=True), markdown)
+    return iter_lines_block_offsets(markdown)
+
+# Characters str.splitlines breaks lines at.
+LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+
+# The scanner behind iter_markdown_block_offsets. With source, the string
+# lines were split from with their line breaks, a FencedCode is a slice
+# of source. Without it the lines of an open fence are kept as they are
+# and joined into a source of the block's own that starts at the opening
+# fence, with a "\n" after any line but the last that has no line break.
+def iter_lines_block_offsets(lines, source = None):
+    current_lines = []
+    current_starts = []
+    opening = None
+    offset = 0
     for line in lines:
-        line = line.strip()
-        if line == "":
-            if current_block != "":
-                blocks.append(current_block)
-                current_block = ""
-            isNewBlock = True
+        line_start = offset
+        offset += len(line)
+        if opening is not None:
+            if code_lines is not None:
+                if needs_break:
+                    code_lines.append("\n")
+                    code_length += 1
+                if code_start is None:
+                    code_start = code_length
+                code_line_start = code_length
+                code_lines.append(line)
+                code_length += len(line)
+                needs_break = not line or line[-1] not in LINE_BREAKS
+            # Code lines are only checked for a closing fence.
+            stripped = line.lstrip()
+            if not stripped.startswith(marker):
+                continue
+            start = offset - len(stripped)
+            stripped = stripped.rstrip()
+            if not stripped.strip("`"):
+                if code_lines is None:
+                    code = make_fenced_code([opening, stripped], source, opening_start, code_start, line_start,
+                        start + len(stripped))
+                else:
+                    code = make_fenced_code([opening, stripped], "".join(code_lines), 0, code_start, code_line_start,
+                        code_line_start + start - line_start + len(stripped))
+                yield code, [opening_start, start]
+                opening = None
+            continue
+
+        stripped = line.strip()
+        start = line_start + len(line) - len(line.lstrip())
+        if stripped.startswith(FENCE):
+            if current_lines:
+                yield current_lines, current_starts
+                current_lines = []
+                current_starts = []
+            if stripped.strip("`") and stripped.endswith(FENCE):
+                if source is None:
+                    code = make_fenced_code([stripped], stripped, 0, len(FENCE), len(stripped) - len(FENCE),
+                        len(stripped))
+                else:
+                    end = start + len(stripped)
+                    code = make_fenced_code([stripped], source, start, start + len(FENCE), end - len(FENCE), end)
+                yield code, [start]
+                continue
+            opening = stripped
+            opening_start = start
+            marker = stripped[:len(stripped) - len(stripped.lstrip("`"))]
+            if source is None:
+                code_lines = [line[start - line_start:]]
+                code_length = len(code_lines[0])
+                needs_break = line[-1] not in LINE_BREAKS
+                code_start = None
+            else:
+                code_lines = None
+                code_start = offset
+        elif stripped == "":
+            if current_lines:
+                yield current_lines, current_starts
+                current_lines = []
+                current_starts = []
         else:
-            current_block += line if isNewBlock else f'\n{line}'
-            isNewBlock = False
-    
-    if current_block != "":
-        blocks.append(current_block)
+            current_lines.append(stripped)
+            current_starts.append(start)
 
-    return blocks
+    if opening is not None:
+        if code_lines is None:
+            code = make_fenced_code([opening], source, opening_start, code_start, offset)
+        else:
+            code = make_fenced_code([opening], "".join(code_lines), 0, code_length if code_start is None else code_start,
+                code_length)
+        yield code, [opening_start]
+    if current_lines:
+        yield current_lines, current_starts
 
-def block_to_block_type(block):
-    block = block.strip()
-    if block.startswith("#"):
+# Moves errors from offsets into a block, "\n".join(lines), to offsets into
+# its source, where the block's stripped lines start at starts (see
+# iter_markdown_block_offsets).
+def errors_to_source(errors, lines, starts):
+    for error in errors:
+        line = 0
+        column = error.offset
+        while column > len(lines[line]) and line + 1 < len(lines):
+            column -= len(lines[line]) + 1
+            line += 1
+        error.offset = starts[line] + column
+
+def iter_markdown_blocks(lines):
+    for block_lines in iter_markdown_block_lines(lines):
+        yield block_lines.text() if isinstance(block_lines, FencedCode) else "\n".join(block_lines)
+
+def markdown_to_blocks(markdown):
+    return list(iter_markdown_blocks(markdown))
+
+ORDERED_LIST_PATTERN = LazyPattern(r'\d+\.')
+
+# Classifies a block from its already stripped lines in a single pass, so
+# callers that split the document into lines do not split the block again.
+def block_lines_to_block_type(lines):
+    if isinstance(lines, FencedCode):
+        return BlockType.CODE
+    if not lines:
+        return BlockType.PARAGRAPH
+    first_line = lines[0]
+    if first_line.startswith("#"):
         return BlockType.HEADING
-    if block.startswith(">"):
+    if first_line.startswith(">"):
         return BlockType.QUOTE
-    if block.startswith("```") and block.endswith("```"):
+    if first_line.startswith("```") and lines[-1].endswith("```"):
         return BlockType.CODE
-    lines = block.splitlines()
-    lines = list(map(lambda line: line.strip(), lines))
-    if all(line.startswith('- ') for line in lines):
-        return BlockType.UNORDERED_LIST
-    
-    numbered_pattern = r'^\d+.'
-    if all(re.search(numbered_pattern, line) for line in lines):
-        return BlockType.ORDERED_LIST
-    
-    return BlockType.PARAGRAPH
-    
+
+    unordered = True
+    ordered = True
+    for line in lines:
+        if unordered and not line.startswith("- "):
+            unordered = False
+        if ordered and not ORDERED_LIST_PATTERN.match(line):
+            ordered = False
+        if not unordered and not ordered:
+            return BlockType.PARAGRAPH
+    return BlockType.UNORDERED_LIST if unordered else BlockType.ORDERED_LIST
+
+def block_to_block_type(block):
+    return block_lines_to_block_type([line.strip() for line in block.strip().splitlines()])
+
+
+ORDERED_ITEM_PATTERN = LazyPattern(r'^\d+\.\s*')
+
+# Where the parts of an inline text came from: for each part, its offset in
+# the text and in the block, "\n".join(lines). parts[i] is a suffix of
+# lines[i], and the parts are joined with one character, as " ".join does.
+def text_origins(lines, parts):
+    origins = []
+    text_start = 0
+    block_start = 0
+    for line, part in zip(lines, parts):
+        origins.append((text_start, block_start + len(line) - len(part)))
+        text_start += len(part) + 1
+        block_start += len(line) + 1
+    return origins
+
+# The offset in the block of offset in an inline text: origins are sorted,
+# and those before (offset + 1,) start at or before offset.
+def text_to_block_offset(offset, origins):
+    text_start, block_start = origins[bisect_left(origins, (offset + 1,)) - 1]
+    return offset + block_start - text_start
+
+# With origins (see text_origins) the errors found in text are moved to
+# their offsets in the block. A search collector (see search.SearchCollector)
+# is given the text nodes.
+def text_to_children(text, profiler = None, errors = None, origins = None, search = None):
+    if profiler is None:
+        text_nodes = text_to_textnodes(text, errors, origins)
+        children = [text_node.to_html_node() for text_node in text_nodes]
+    else:
+        start = time.perf_counter()
+        text_nodes = text_to_textnodes(text, errors, origins)
+        middle = time.perf_counter()
+        children = [text_node.to_html_node() for text_node in text_nodes]
+        profiler.record("text_to_textnodes", middle - start, len(text_nodes))
+        profiler.record("to_html_node", time.perf_counter() - middle, len(children))
+    if search is not None:
+        search.add_text(text_nodes)
+    return children or [LeafNode(None, "")]
+
+# A heading block's text with its markup resolved, as a title shows it.
+def heading_text(block):
+    return "".join(node.text for node in text_to_textnodes(block.lstrip("#").strip(), []))
+
+# Finds a page's title as its heading blocks go by: the text of the first
+# level one heading, else of the first heading, else "". The page <title>
+# and the search index both take it from here.
+class PageTitle:
+    __slots__ = ("first", "level_one")
+
+    def __init__(self):
+        self.first = None
+        self.level_one = None
+
+    def add(self, block, text):
+        if self.first is None:
+            self.first = text
+        if self.level_one is None and not block.startswith("##"):
+            self.level_one = text
+
+    def text(self):
+        if self.level_one is not None:
+            return self.level_one
+        return "" if self.first is None else self.first
+
+def heading_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    level = len(block) - len(block.lstrip("#"))
+    text = block[level:].strip()
+    origins = None if errors is None else [(0, len(block) - len(block[level:].lstrip()))]
+    return ParentNode(f"h{min(level, 6)}", text_to_children(text, profiler, errors, origins, search))
+
+def code_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    if isinstance(lines, FencedCode):
+        return ParentNode("pre", [LeafNode("code", lines.code())])
+    code = block[3:-3]
+    if "\n" in code:
+        # The rest of the opening fence line is a language hint.
+        code = code.split("\n", 1)[1]
+    return ParentNode("pre", [LeafNode("code", code)])
+
+def quote_parts(lines):
+    return [line.lstrip(">").strip() for line in lines]
+
+def list_item_texts(lines, block_type):
+    if block_type == BlockType.UNORDERED_LIST:
+        return [line.strip()[2:] for line in lines]
+    return [ORDERED_ITEM_PATTERN.sub("", line.strip(), count=1) for line in lines]
+
+# The inline texts a block renders, built as its renderer builds them: one
+# per list item, none for code and one for any other block.
+def block_inline_texts(block, block_type, lines):
+    if block_type == BlockType.PARAGRAPH:
+        return [" ".join(lines)]
+    if block_type == BlockType.HEADING:
+        return [block.lstrip("#").strip()]
+    if block_type == BlockType.QUOTE:
+        return [" ".join(quote_parts(lines))]
+    if block_type == BlockType.CODE:
+        return []
+    return list_item_texts(lines, block_type)
+
+def quote_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    parts = quote_parts(lines)
+    origins = None if errors is None else text_origins(lines, parts)
+    return ParentNode("blockquote", text_to_children(" ".join(parts), profiler, errors, origins, search))
+
+# Each item is its own inline text, so each gets the origin of its line.
+def list_items(lines, parts, profiler, errors, search):
+    if errors is None:
+        return [ParentNode("li", text_to_children(part, profiler, None, None, search)) for part in parts]
+    return [ParentNode("li", text_to_children(part, profiler, errors, [(0, block_start)], search))
+        for part, (_, block_start) in zip(parts, text_origins(lines, parts))]
+
+def unordered_list_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    return ParentNode("ul", list_items(lines, list_item_texts(lines, BlockType.UNORDERED_LIST), profiler, errors, search))
+
+def ordered_list_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    return ParentNode("ol", list_items(lines, list_item_texts(lines, BlockType.ORDERED_LIST), profiler, errors, search))
+
+def paragraph_to_html_node(block, lines, profiler = None, errors = None, search = None):
+    return ParentNode("p", text_to_children(" ".join(lines), profiler, errors, None, search))
+
+BLOCK_TO_HTML_NODE = {
+    BlockType.HEADING: heading_to_html_node,
+    BlockType.CODE: code_to_html_node,
+    BlockType.QUOTE: quote_to_html_node,
+    BlockType.UNORDERED_LIST: unordered_list_to_html_node,
+    BlockType.ORDERED_LIST: ordered_list_to_html_node,
+    BlockType.PARAGRAPH: paragraph_to_html_node,
+}
+
+def block_to_html_node(block, block_type, lines = None, profiler = None, errors = None, search = None):
+    if lines is None:
+        lines = block.splitlines()
+    return BLOCK_TO_HTML_NODE[block_type](block, lines, profiler, errors, search)
+
+# A block's html. With a profiler (see profiling.Profiler) each stage is
+# timed; without one nothing is.
+def block_to_html(block, block_type, lines = None, profiler = None, errors = None, search = None):
+    if profiler is None:
+        return block_to_html_node(block, block_type, lines, None, errors, search).to_html()
+    node = block_to_html_node(block, block_type, lines, profiler, errors, search)
+    start = time.perf_counter()
+    html = node.to_html()
+    profiler.record("to_html", time.perf_counter() - start, node.count_nodes())
+    return html
+
+# Unpaired delimiters are rendered as text; pass a list as errors to collect
+# them, with their offsets in markdown.
+def markdown_to_html_node(markdown, errors = None):
+    children = []
+    if errors is None:
+        for lines in iter_markdown_block_lines(markdown):
+            children.append(block_to_html_node("\n".join(lines), block_lines_to_block_type(lines), lines))
+        return ParentNode("div", children)
+    for lines, starts in iter_markdown_block_offsets(markdown):
+        block_errors = []
+        children.append(block_to_html_node("\n".join(lines), block_lines_to_block_type(lines), lines, errors=block_errors))
+        errors_to_source(block_errors, lines, starts)
+        errors.extend(block_errors)
+    return ParentNode("div", children)
+
+# LRU cache of rendered block html keyed by the raw block text and its type.
+# Blocks that repeat across pages (footers, disclaimers, admonitions) and the
+# untouched blocks of an edited page are rendered once; hits and misses are
+# counted so max_entries can be tuned.
+class BlockCache:
+    def __init__(self, max_entries = 4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # What a search collector took from each block, for blocks rendered
+        # while one was collecting (see search.SearchCollector).
+        self.summaries = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Code blocks are not cached: a FencedCode's block text is only its
+    # fences, and rendering code is a single escape anyway.
+    def get(self, block, block_type):
+        if block_type == BlockType.CODE:
+            return None
+        key = (block, block_type)
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return html
+
+    def put(self, block, block_type, html, summary = None):
+        if block_type == BlockType.CODE:
+            return
+        key = (block, block_type)
+        self.entries[key] = html
+        if summary is not None:
+            self.summaries[key] = summary
+        if len(self.entries) > self.max_entries:
+            self.summaries.pop(self.entries.popitem(last=False)[0], None)
+
+    # Only blocks that render without errors are cached, so a hit has none
+    # to report. Errors go to errors with their offsets in the block. A hit
+    # gives search the summary it made of the block when it was rendered,
+    # or has it read the block when there is none.
+    def render(self, block, block_type, lines = None, errors = None, profiler = None, search = None):
+        html = self.get(block, block_type)
+        if html is None:
+            block_errors = []
+            html = block_to_html(block, block_type, lines, profiler, block_errors, search)
+            if not block_errors:
+                self.put(block, block_type, html, None if search is None else search.block_summary())
+            elif errors is not None:
+                errors.extend(block_errors)
+            return html
+
+        if profiler is not None:
+            profiler.record("block_cache_hit", 0.0)
+        if search is not None:
+            summary = self.summaries.get((block, block_type))
+            if summary is None:
+                search.read_block(block, block_type, lines)
+                self.summaries[(block, block_type)] = search.block_summary()
+            else:
+                search.add_summary(summary)
+        return html
+
+    def clear(self):
+        self.entries.clear()
+        self.summaries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f'BlockCache(hits={self.hits}, misses={self.misses}, size={len(self.entries)}, max_entries={self.max_entries})'
+
+# Renders the blocks of lines (a string, a file or any iterable of lines)
+# one at a time and passes each block's html to write as soon as it is
+# ready. Nothing of a block is kept once it is written, so with a file
+# and a write that goes to disk, memory holds about one block whatever
+# the size of the document. Errors are collected with their offsets in
+# the source, counted as iter_markdown_block_offsets counts them. With a
+# profiler the page is timed as path (see profiling.Profiler), and a search
+# collector is given the text of every block but code.
+def write_markdown_html(lines, write, block_cache = None, errors = None, profiler = None, path = "<string>",
+        search = None):
+    write("<div>")
+    if errors is None:
+        blocks = ((block_lines, None) for block_lines in iter_markdown_block_lines(lines))
+    else:
+        blocks = iter_markdown_block_offsets(lines)
+    if profiler is not None:
+        blocks = profiler.iter_page_blocks(blocks, path)
+    for block_lines, starts in blocks:
+        if isinstance(block_lines, FencedCode):
+            # The code goes from its slice of the source through one escape
+            # into the output.
+            write("<pre><code>")
+            write(escape_text(block_lines.code()))
+            write("</code></pre>")
+            continue
+        if profiler is None:
+            block = "\n".join(block_lines)
+            block_type = block_lines_to_block_type(block_lines)
+        else:
+            start = time.perf_counter()
+            block = "\n".join(block_lines)
+            block_type = block_lines_to_block_type(block_lines)
+            profiler.record("block_to_block_type", time.perf_counter() - start)
+        block_errors = None if errors is None else []
+        if search is not None:
+            search.start_block(block, block_type)
+        if block_cache is None:
+            write(block_to_html(block, block_type, block_lines, profiler, block_errors, search))
+        else:
+            write(block_cache.render(block, block_type, block_lines, block_errors, profiler, search))
+        if block_errors:
+            errors_to_source(block_errors, block_lines, starts)
+            errors.extend(block_errors)
+    write("</div>")
+
+def markdown_to_html(markdown, block_cache = None, errors = None, profiler = None, path = "<string>", search = None):
+    chunks = []
+    write_markdown_html(markdown, chunks.append, block_cache, errors, profiler, path, search)
+    return "".join(chunks)
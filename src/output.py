@@ -0,0 +1,71 @@
+import os
+import threading
+
+# Writes html to destination through a temporary file and a rename, so a
+# reader or sync job never sees a half-written page. When the file already
+# holds exactly these bytes it is left alone, mtime included, and False is
+# returned. The temporary name is unique per process and thread, which is
+# all concurrent builds need, and avoids importing tempfile.
+def write_output(destination, html):
+    data = html.encode("utf-8")
+    try:
+        if os.path.getsize(destination) == len(data):
+            with open(destination, "rb") as existing_file:
+                if existing_file.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+
+    temp_path, descriptor = open_temp_output(destination)
+    try:
+        with os.fdopen(descriptor, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, destination)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return True
+
+# Sources larger than this are rendered with stream_output rather than
+# read and rendered whole.
+STREAM_BYTES = 32 * 1024 * 1024
+
+def open_temp_output(destination):
+    directory, name = os.path.split(destination)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    return temp_path, os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+# write_output for html too large to hold: write is called with a function
+# that appends a chunk of html to a temporary file, so the html never
+# exists as one string. The existing destination is compared with the result in chunks
+# and left alone, returning False, when they are the same.
+def stream_output(destination, write):
+    temp_path, descriptor = open_temp_output(destination)
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8", newline="") as temp_file:
+            write(temp_file.write)
+        if same_file_contents(temp_path, destination):
+            os.unlink(temp_path)
+            return False
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return True
+
+def same_file_contents(path, other_path, chunk_size = 1024 * 1024):
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+        with open(path, "rb") as first, open(other_path, "rb") as second:
+            while True:
+                chunk = first.read(chunk_size)
+                if chunk != second.read(chunk_size):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,89 @@
+import heapq
+import time
+
+from markdown import block_lines_to_block_type
+
+# Opt-in build instrumentation. A build that wants timings passes a Profiler
+# to markdown_to_html or write_markdown_html, which then record wall time,
+# call counts and node counts per stage, per page and for the slowest
+# blocks as they render. Without one the render path only checks for None
+# once per block.
+class Profiler:
+    def __init__(self, top = 10):
+        self.top = top
+        self.stages = {}
+        self.pages = {}
+        self.slow_blocks = []
+
+    def record(self, stage, elapsed, nodes = 0):
+        totals = self.stages.get(stage)
+        if totals is None:
+            totals = self.stages[stage] = [0.0, 0, 0]
+        totals[0] += elapsed
+        totals[1] += 1
+        totals[2] += nodes
+
+    def record_page(self, path, elapsed, blocks):
+        self.pages[path] = (elapsed, blocks)
+
+    def record_block(self, path, index, block_type, block, elapsed):
+        entry = (elapsed, path, index, block_type.value, block[:60])
+        if len(self.slow_blocks) < self.top:
+            heapq.heappush(self.slow_blocks, entry)
+        else:
+            heapq.heappushpop(self.slow_blocks, entry)
+
+    # Passes on the blocks of the page path as write_markdown_html renders
+    # them, timing how long each took to split off and to render.
+    def iter_page_blocks(self, blocks, path):
+        clock = time.perf_counter
+        page_start = clock()
+        splitting = 0.0
+        index = 0
+        blocks = iter(blocks)
+        while True:
+            start = clock()
+            item = next(blocks, None)
+            if item is None:
+                break
+            block_start = clock()
+            splitting += block_start - start
+            yield item
+            elapsed = clock() - block_start
+            if len(self.slow_blocks) < self.top or elapsed > self.slow_blocks[0][0]:
+                lines = item[0]
+                self.record_block(path, index, block_lines_to_block_type(lines), "\n".join(lines), elapsed)
+            index += 1
+        self.record("markdown_to_blocks", splitting, index)
+        self.record_page(path, clock() - page_start, index)
+
+    def merge(self, other):
+        for stage, (elapsed, calls, nodes) in other.stages.items():
+            totals = self.stages.setdefault(stage, [0.0, 0, 0])
+            totals[0] += elapsed
+            totals[1] += calls
+            totals[2] += nodes
+        self.pages.update(other.pages)
+        for entry in other.slow_blocks:
+            if len(self.slow_blocks) < self.top:
+                heapq.heappush(self.slow_blocks, entry)
+            else:
+                heapq.heappushpop(self.slow_blocks, entry)
+
+    def report(self):
+        lines = [f"{'stage':<22}{'time (ms)':>12}{'calls':>10}{'nodes':>10}"]
+        for stage, (elapsed, calls, nodes) in sorted(self.stages.items(), key=lambda item: -item[1][0]):
+            lines.append(f"{stage:<22}{elapsed * 1000:>12.3f}{calls:>10}{nodes:>10}")
+
+        lines.append("")
+        lines.append("slowest pages")
+        slowest_pages = heapq.nlargest(self.top, self.pages.items(), key=lambda item: item[1][0])
+        for path, (elapsed, blocks) in slowest_pages:
+            lines.append(f"{elapsed * 1000:>10.3f} ms  {path} ({blocks} blocks)")
+
+        lines.append("")
+        lines.append("slowest blocks")
+        for elapsed, path, index, block_type, preview in sorted(self.slow_blocks, reverse=True):
+            preview = preview.replace("\n", " ")
+            lines.append(f"{elapsed * 1000:>10.3f} ms  {path}#{index} {block_type}: {preview}")
+        return "\n".join(lines)
@@ -0,0 +1,152 @@
+import json
+import os
+from collections import Counter
+
+from linkindex import page_url_path
+from markdown import BlockType, LazyPattern, PageTitle, block_inline_texts, block_lines_to_block_type, \
+    iter_markdown_block_lines, text_to_textnodes
+from output import write_output
+from textnode import TextType
+
+# Letters and digits; "_" is emphasis markup as often as it is a word
+# character, so snake_case is indexed as two terms.
+TERM_PATTERN = LazyPattern(r"[^\W_]+")
+# Shard name for pages at the top of the content directory. Directories
+# whose names start with "_" get one more (see page_section), so no
+# directory's shard can take this name.
+ROOT_SECTION = "_root"
+
+# Collects a page's search entry while it renders: write_markdown_html
+# starts each block and text_to_children hands over the text nodes it has
+# already tokenized, so the page is not parsed again. The entry holds the
+# page's title (see PageTitle), its headings as heading_text reads them,
+# and how often each lowercased term occurs in the text the page shows,
+# code blocks and code spans left out. A block's summary is what it gave,
+# kept by BlockCache so a cached block can give it again.
+class SearchCollector:
+    def __init__(self):
+        self.title = PageTitle()
+        self.headings = []
+        self.terms = Counter()
+        self.blocks = 0
+        self.block = None
+        self.block_type = None
+        self.heading = None
+        self.block_texts = []
+
+    def start_block(self, block, block_type):
+        self.finish_block()
+        self.blocks += 1
+        self.block = block
+        self.block_type = block_type
+
+    def finish_block(self):
+        if self.heading is not None:
+            self.headings.append(self.heading)
+            self.title.add(self.block, self.heading)
+            self.heading = None
+        if self.block_texts:
+            self.terms.update(TERM_PATTERN.findall(" ".join(self.block_texts).lower()))
+            self.block_texts = []
+
+    # Code spans count as spaces, so no term runs across one. The block's
+    # texts are split into terms once, when it is finished.
+    def add_text(self, nodes):
+        if self.block_type == BlockType.HEADING:
+            self.heading = "".join(node.text for node in nodes)
+        self.block_texts.append("".join(" " if node.text_type == TextType.CODE else node.text for node in nodes))
+
+    # Reads a block that was not rendered, as rendering it would.
+    def read_block(self, block, block_type, lines = None):
+        if lines is None:
+            lines = block.splitlines()
+        for text in block_inline_texts(block, block_type, lines):
+            self.add_text(text_to_textnodes(text, []))
+
+    def block_summary(self):
+        return self.heading, tuple(self.block_texts)
+
+    def add_summary(self, summary):
+        self.heading, texts = summary
+        self.block_texts.extend(texts)
+
+    def entry(self):
+        self.finish_block()
+        return {"title": self.title.text(), "headings": list(self.headings), "terms": dict(self.terms)}
+
+# The search entry of markdown (a string or any iterable of lines) read
+# without rendering it, for pages whose html was not rendered here.
+def extract_search_entry(markdown):
+    collector = SearchCollector()
+    for lines in iter_markdown_block_lines(markdown):
+        block_type = block_lines_to_block_type(lines)
+        block = "\n".join(lines)
+        collector.start_block(block, block_type)
+        collector.read_block(block, block_type, lines)
+    return collector.entry()
+
+def page_section(page):
+    parts = page.replace(os.sep, "/").split("/")
+    if len(parts) == 1:
+        return ROOT_SECTION
+    return "_" + parts[0] if parts[0].startswith("_") else parts[0]
+
+# Search entries of every page, saved as json between builds like the
+# LinkIndex, and published as one shard per section of the site: the
+# section's pages and, for each term, a flat list of (page number, count)
+# pairs. Only sections whose entries changed are written again.
+class SearchIndex:
+    def __init__(self):
+        self.pages = {}
+        self.dirty = set()
+
+    def update(self, page, entry):
+        if self.pages.get(page) != entry:
+            self.pages[page] = entry
+            self.dirty.add(page_section(page))
+
+    def remove(self, page):
+        if self.pages.pop(page, None) is not None:
+            self.dirty.add(page_section(page))
+
+    def sections(self):
+        return {page_section(page) for page in self.pages}
+
+    def shard(self, section):
+        pages = sorted(page for page in self.pages if page_section(page) == section)
+        postings = {}
+        for number, page in enumerate(pages):
+            for term, count in self.pages[page]["terms"].items():
+                postings.setdefault(term, []).extend((number, count))
+        return {
+            "pages": [{"url": page_url_path(page), "title": self.pages[page]["title"],
+                "headings": self.pages[page]["headings"]} for page in pages],
+            "postings": dict(sorted(postings.items())),
+        }
+
+    # Writes the shards of changed sections, and of sections missing from
+    # search_dir, and removes those of sections that no longer have pages.
+    def write_shards(self, search_dir):
+        sections = self.sections()
+        for section in sorted(sections):
+            destination = os.path.join(search_dir, f"{section}.json")
+            if section in self.dirty or not os.path.exists(destination):
+                write_output(destination, json.dumps(self.shard(section), ensure_ascii=False, separators=(",", ":")))
+        for section in self.dirty - sections:
+            destination = os.path.join(search_dir, f"{section}.json")
+            if os.path.exists(destination):
+                os.remove(destination)
+        self.dirty.clear()
+
+    def save(self, path):
+        write_output(path, json.dumps({"pages": self.pages}, sort_keys=True))
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        try:
+            with open(path, encoding="utf-8") as index_file:
+                index.pages = json.load(index_file)["pages"]
+        except FileNotFoundError:
+            pass
+        return index
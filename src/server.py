@@ -0,0 +1,382 @@
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from build import build, find_markdown_files, output_path, write_page
+from markdown import BlockCache, markdown_to_html
+from sourcemap import LineIndex, format_error
+from template import TemplateCache
+
+DEBOUNCE_SECONDS = 0.02
+POLL_INTERVAL_SECONDS = 0.25
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_TIMEOUT_SECONDS = 25
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# Watches directory trees with Linux inotify through libc, so a save is
+# seen as soon as the editor closes the file. wait() blocks for up to
+# timeout seconds and returns the set of paths that changed. A directory
+# in the set stands for everything that was in it: one moved away, or a
+# watched tree after the kernel's event queue overflowed and events were
+# lost.
+class InotifyWatcher:
+    def __init__(self, *directories):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = []
+        self.directories = {}
+        self.watch(*directories)
+
+    # Watches the trees of the directories not watched yet.
+    def watch(self, *directories):
+        for directory in directories:
+            if directory not in self.roots:
+                self.roots.append(directory)
+                self.add_tree(directory)
+
+    def add_tree(self, directory):
+        for root, _, _ in os.walk(directory):
+            self.add_watch(root)
+
+    def add_watch(self, directory):
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), INOTIFY_MASK)
+        if descriptor >= 0:
+            self.directories[descriptor] = directory
+
+    # Stops watching directory and the directories under it, whose watches
+    # would otherwise keep reporting events under their old paths.
+    def remove_tree(self, directory):
+        prefix = os.path.join(directory, "")
+        for descriptor, path in list(self.directories.items()):
+            if path == directory or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, descriptor)
+                del self.directories[descriptor]
+
+    # Walks every tree again after events were lost: watches of
+    # directories that are gone are dropped, new directories are watched,
+    # and the roots are returned, standing for everything in them.
+    def rescan(self):
+        for descriptor, path in list(self.directories.items()):
+            if not os.path.isdir(path):
+                self.libc.inotify_rm_watch(self.fd, descriptor)
+                del self.directories[descriptor]
+        for root in self.roots:
+            self.add_tree(root)
+        return set(self.roots)
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, name_length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_length].rstrip(b"\0"))
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.rescan())
+                continue
+            if mask & IN_IGNORED:
+                # The kernel removed the watch: its directory is gone.
+                self.directories.pop(descriptor, None)
+                continue
+            directory = self.directories.get(descriptor)
+            if directory is None:
+                continue
+            if mask & IN_DELETE_SELF:
+                del self.directories[descriptor]
+                changed.add(directory)
+                continue
+            if not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files written into a new directory before its watch
+                    # exists would be missed, so report them too.
+                    for root, _, files in os.walk(path):
+                        self.add_watch(root)
+                        changed.update(os.path.join(root, file_name) for file_name in files)
+                elif mask & IN_MOVED_FROM:
+                    self.remove_tree(path)
+                    changed.add(path)
+            else:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+# Portable fallback that compares mtimes and sizes of every file in the
+# trees on each poll.
+class PollingWatcher:
+    def __init__(self, *directories, interval = POLL_INTERVAL_SECONDS):
+        self.directories = directories
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    # Watches the trees of the directories not watched yet, from their
+    # files as they are now.
+    def watch(self, *directories):
+        new_directories = tuple(directory for directory in directories if directory not in self.directories)
+        if new_directories:
+            self.directories += new_directories
+            self.snapshot.update(self.scan(new_directories))
+
+    def scan(self, directories = None):
+        snapshot = {}
+        for directory in self.directories if directories is None else directories:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self.scan()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+def make_watcher(*directories):
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(*directories)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(*directories)
+
+# Blocks until something changes, then keeps collecting until the tree has
+# been quiet for debounce seconds, so one save (or a burst of them) leads to
+# a single rebuild.
+def collect_changes(watcher, timeout = None, debounce = DEBOUNCE_SECONDS):
+    changed = watcher.wait(timeout if timeout is not None else 3600)
+    while changed:
+        more = watcher.wait(debounce)
+        if not more:
+            break
+        changed |= more
+    return changed
+
+# Output of a site being served in watch mode. Pages are rendered with a
+# block cache that lives for the whole session, and every rebuild bumps
+# generation so waiting browsers reload. With a template_path pages are
+# written through it, compiled again whenever it or a partial changed, and
+# every page is rewritten when it is. A page or template that fails to
+# render is reported on stderr and left as it was, so one bad save does
+# not stop the server. pages holds the sources the site has seen, so a
+# changed directory can stand for the pages that were in it as well as
+# those that are.
+class DevSite:
+    def __init__(self, content_dir, out_dir, template_path = None):
+        self.content_dir = os.path.abspath(content_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.block_cache = BlockCache()
+        self.template_path = template_path
+        self.templates = TemplateCache()
+        self.template = None if template_path is None else self.templates.get(template_path)
+        self.pages = set(find_markdown_files(self.content_dir))
+        self.generation = 0
+        self.condition = threading.Condition()
+
+    # Directories holding the template and its partials, to be watched
+    # along with the content. They follow the template last compiled, so a
+    # partial added in a new directory is watched from then on.
+    def template_dirs(self):
+        if self.template is None:
+            return []
+        return sorted({os.path.dirname(os.path.abspath(path)) for path in self.template.dependencies})
+
+    def rebuild(self, changed_paths):
+        rebuilt = []
+        template = self.template
+        if self.template_path is not None:
+            try:
+                template = self.templates.get(self.template_path)
+            except Exception as error:
+                print(f"{self.template_path}: {error}", file=sys.stderr)
+                return rebuilt
+        if template is not self.template:
+            self.template = template
+            changed_paths = [self.content_dir]
+        for relative_path in sorted(self.changed_pages(changed_paths)):
+            destination = os.path.join(self.out_dir, output_path(relative_path))
+            try:
+                with open(os.path.join(self.content_dir, relative_path), encoding="utf-8") as source_file:
+                    source = source_file.read()
+            except FileNotFoundError:
+                self.pages.discard(relative_path)
+                if os.path.exists(destination):
+                    os.remove(destination)
+                    rebuilt.append(output_path(relative_path))
+                continue
+            self.pages.add(relative_path)
+            errors = []
+            try:
+                write_page(destination, source, markdown_to_html(source, self.block_cache, errors), template)
+            except Exception as error:
+                print(f"{relative_path}: {error}", file=sys.stderr)
+                continue
+            if errors:
+                index = LineIndex(source)
+                for error in errors:
+                    print(format_error(relative_path, *index.position(error.offset), error.message), file=sys.stderr)
+            rebuilt.append(output_path(relative_path))
+
+        if rebuilt:
+            with self.condition:
+                self.generation += 1
+                self.condition.notify_all()
+        return rebuilt
+
+    # The pages, relative to the content directory, that changed paths may
+    # have touched: each changed source, and for a path that is, or was, a
+    # directory the pages in it now and those seen in it before.
+    def changed_pages(self, changed_paths):
+        pages = set()
+        for path in changed_paths:
+            relative_path = os.path.relpath(os.path.abspath(path), self.content_dir)
+            if relative_path.startswith(".."):
+                continue
+            if relative_path.endswith(".md") and not os.path.isdir(path):
+                pages.add(relative_path)
+                continue
+            if relative_path == ".":
+                pages.update(self.pages)
+            else:
+                prefix = os.path.join(relative_path, "")
+                pages.update(page for page in self.pages if page.startswith(prefix))
+            if os.path.isdir(path):
+                pages.update(os.path.normpath(os.path.join(relative_path, page)) for page in find_markdown_files(path))
+        return pages
+
+    def wait_for_change(self, generation, timeout = LIVE_RELOAD_TIMEOUT_SECONDS):
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+LIVE_RELOAD_SCRIPT = """<script>
+(function poll(generation) {
+  fetch("%s?generation=" + generation)
+    .then(function (response) { return response.text(); })
+    .then(function (next) { if (next !== String(generation)) { location.reload(); } else { poll(generation); } })
+    .catch(function () { setTimeout(function () { poll(generation); }, 1000); });
+})(%d);
+</script>"""
+
+def inject_live_reload(html, generation):
+    script = LIVE_RELOAD_SCRIPT % (LIVE_RELOAD_PATH, generation)
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + script
+    return html[:index] + script + html[index:]
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, site, **kwargs):
+        self.site = site
+        super().__init__(*args, directory=site.out_dir, **kwargs)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        if path == LIVE_RELOAD_PATH:
+            generation = parse_qs(url.query).get("generation", [""])[0]
+            generation = int(generation) if generation.isdigit() else self.site.generation
+            self.send_text(str(self.site.wait_for_change(generation)), "text/plain")
+            return
+
+        file_path = self.translate_path(path)
+        if os.path.isdir(file_path):
+            file_path = os.path.join(file_path, "index.html")
+        if not file_path.endswith(".html") or not os.path.isfile(file_path):
+            super().do_GET()
+            return
+        with open(file_path, encoding="utf-8") as html_file:
+            html = html_file.read()
+        self.send_text(inject_live_reload(html, self.site.generation), "text/html")
+
+    def send_text(self, text, content_type):
+        body = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(site, host = "127.0.0.1", port = 8000):
+    handler = functools.partial(DevRequestHandler, site=site)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def serve(content_dir, out_dir, host = "127.0.0.1", port = 8000, watch = True, workers = None, template_path = None):
+    errors = []
+    build(content_dir, out_dir, workers=workers, template_path=template_path, errors=errors)
+    for page, line, column, message in errors:
+        print(format_error(page, line, column, message), file=sys.stderr)
+    site = DevSite(content_dir, out_dir, template_path)
+    server = make_server(site, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {out_dir} at http://{host}:{server.server_address[1]}/")
+
+    watcher = make_watcher(site.content_dir, *site.template_dirs()) if watch else None
+    try:
+        while True:
+            if watcher is None:
+                time.sleep(3600)
+                continue
+            changed = collect_changes(watcher)
+            start = time.perf_counter()
+            rebuilt = site.rebuild(changed)
+            if rebuilt:
+                print(f"Rebuilt {', '.join(rebuilt)} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            watcher.watch(*site.template_dirs())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if watcher is not None:
+            watcher.close()
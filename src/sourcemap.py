@@ -0,0 +1,84 @@
+import json
+from bisect import bisect_right
+
+from markdown import FencedCode, LazyPattern, block_lines_to_block_type, block_to_html_node, errors_to_source, \
+    iter_markdown_block_offsets
+
+# The line breaks str.splitlines splits on, which is how blocks are split
+# into lines, so positions count the same lines.
+LINE_BREAK_PATTERN = LazyPattern(r"\r\n|[\n\r\v\f\x1c-\x1e\x85\u2028\u2029]")
+
+# Turns source offsets into 1-based (line, column) pairs. The line starts
+# are found once, and each lookup is a bisect, so positions can be kept as
+# plain offsets until something needs to show them.
+class LineIndex:
+    def __init__(self, source):
+        self.line_starts = [0, *(match.end() for match in LINE_BREAK_PATTERN.finditer(source))]
+
+    def position(self, offset):
+        line = bisect_right(self.line_starts, offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    # Positions of the first and last character of [start, end).
+    def span(self, start, end):
+        return (*self.position(start), *self.position(max(start, end - 1)))
+
+# The (line, column) of each of offsets into the text of lines, an
+# iterable such as a file, found in one pass that stops after the last.
+# Lines are split again as LineIndex splits them.
+def line_positions(lines, offsets):
+    wanted = sorted(set(offsets))
+    found = {}
+    next_wanted = 0
+    line_start = 0
+    pieces = (piece for line in lines for piece in line.splitlines(keepends=True))
+    for number, line in enumerate(pieces, 1):
+        line_end = line_start + len(line)
+        while next_wanted < len(wanted) and wanted[next_wanted] < line_end:
+            found[wanted[next_wanted]] = (number, wanted[next_wanted] - line_start + 1)
+            next_wanted += 1
+        if next_wanted == len(wanted):
+            break
+        line_start = line_end
+    return [found[offset] for offset in offsets]
+
+# How build, render and serve print a problem found in a page.
+def format_error(page, line, column, message):
+    return f"{page}:{line}:{column}: {message}"
+
+# Renders markdown like markdown_to_html and also returns a source map: for
+# each top level html element its [start, end) character offsets in the
+# html, and the first and last line and column of the markdown block it
+# came from. Unpaired delimiters are listed with their line and column.
+#
+# Block offsets are counted while the document is split and html offsets
+# are the running length of the output, so the map adds a bisect or two
+# per block.
+def render_with_source_map(markdown, source = None):
+    index = LineIndex(markdown)
+    chunks = ["<div>"]
+    length = len(chunks[0])
+    blocks = []
+    errors = []
+    for lines, starts in iter_markdown_block_offsets(markdown):
+        block_errors = []
+        html = block_to_html_node("\n".join(lines), block_lines_to_block_type(lines), lines,
+            errors=block_errors).to_html()
+        chunks.append(html)
+        start = starts[0]
+        end = lines.block_end if isinstance(lines, FencedCode) else starts[-1] + len(lines[-1])
+        blocks.append({"html": [length, length + len(html)], "source": list(index.span(start, end))})
+        length += len(html)
+        errors_to_source(block_errors, lines, starts)
+        for error in block_errors:
+            line, column = index.position(error.offset)
+            errors.append({"line": line, "column": column, "message": error.message})
+    chunks.append("</div>")
+    source_map = {"version": 1, "source": source, "blocks": blocks, "errors": errors}
+    return "".join(chunks), source_map
+
+def source_map_json(source_map):
+    return json.dumps(source_map, separators=(",", ":"))
+
+def source_map_path(output_path):
+    return output_path + ".map"
@@ -0,0 +1,115 @@
+import os
+
+from htmlnode import escape_text
+from markdown import BlockType, LazyPattern, PageTitle, block_lines_to_block_type, heading_text, \
+    iter_markdown_block_lines
+
+# Page templates are html with {{ title }} and {{ content }} slots and
+# {{> name }} partials, which name another template file relative to the
+# one that includes them.
+TAG_PATTERN = LazyPattern(r"\{\{\s*(>?)\s*([^{}\s]+)\s*\}\}")
+SLOTS = ("title", "content")
+
+# A template compiled once into literal chunks with a slot between each
+# pair, partials already spliced in: literals[0], slots[0], literals[1],
+# ... Rendering only writes strings, so a page costs no parsing.
+# dependencies maps the template and every partial it read to the
+# mtime_ns it had then.
+class Template:
+    __slots__ = ("path", "literals", "slots", "dependencies")
+
+    def __init__(self, path, literals, slots, dependencies):
+        self.path = path
+        self.literals = literals
+        self.slots = slots
+        self.dependencies = dependencies
+
+    def __repr__(self):
+        return f'Template({self.path}, slots={self.slots})'
+
+    def is_stale(self):
+        try:
+            return any(os.stat(path).st_mtime_ns != mtime for path, mtime in self.dependencies.items())
+        except FileNotFoundError:
+            return True
+
+    # Writes the page through write: the title is escaped, and
+    # write_content(write) writes the body html, so a streamed body goes
+    # straight to the output between the template's chunks.
+    def render(self, write, title, write_content):
+        literals = self.literals
+        write(literals[0])
+        for index, slot in enumerate(self.slots):
+            if slot == "title":
+                write(escape_text(title))
+            else:
+                write_content(write)
+            write(literals[index + 1])
+
+    # Characters written before the first content slot for this title, so
+    # offsets into the body can be turned into offsets into the page.
+    def content_offset(self, title):
+        offset = len(self.literals[0])
+        for index, slot in enumerate(self.slots):
+            if slot == "content":
+                break
+            offset += len(escape_text(title)) + len(self.literals[index + 1])
+        return offset
+
+# The page title of markdown (a string or any iterable of lines), as
+# PageTitle finds it, the same title the search index keeps. Reading stops
+# at the first level one heading.
+def extract_title(markdown):
+    title = PageTitle()
+    for lines in iter_markdown_block_lines(markdown):
+        if block_lines_to_block_type(lines) == BlockType.HEADING:
+            block = "\n".join(lines)
+            title.add(block, heading_text(block))
+            if title.level_one is not None:
+                break
+    return title.text()
+
+def compile_template(path):
+    literals = [""]
+    slots = []
+    dependencies = {}
+    compile_into(path, literals, slots, dependencies, ())
+    return Template(path, literals, slots, dependencies)
+
+def compile_into(path, literals, slots, dependencies, including):
+    if path in including:
+        raise ValueError(f"Template includes itself: {' -> '.join(including + (path,))}")
+    # The mtime is taken before reading, so an edit made while reading
+    # leaves the template stale rather than cached with old text.
+    dependencies[path] = os.stat(path).st_mtime_ns
+    with open(path, encoding="utf-8") as template_file:
+        text = template_file.read()
+
+    position = 0
+    for match in TAG_PATTERN.finditer(text):
+        literals[-1] += text[position:match.start()]
+        position = match.end()
+        partial, name = match.groups()
+        if partial:
+            compile_into(os.path.join(os.path.dirname(path), name), literals, slots, dependencies, including + (path,))
+        elif name in SLOTS:
+            slots.append(name)
+            literals.append("")
+        else:
+            raise ValueError(f"Unknown template slot {name!r} in {path}, expected one of {', '.join(SLOTS)}")
+    literals[-1] += text[position:]
+
+# Compiled templates by path. get() checks the mtimes of a template and
+# its partials and compiles it again when any of them changed.
+class TemplateCache:
+    def __init__(self):
+        self.templates = {}
+
+    def get(self, path):
+        template = self.templates.get(path)
+        if template is None or template.is_stale():
+            template = self.templates[path] = compile_template(path)
+        return template
+
+    def clear(self):
+        self.templates.clear()
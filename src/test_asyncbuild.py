@@ -0,0 +1,59 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from asyncbuild import build_async
+from build import build
+
+class TestAsyncBuild(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.content_dir = os.path.join(self.temp_dir.name, "content")
+        self.out_dir = os.path.join(self.temp_dir.name, "public")
+        self.pages = {os.path.join("section", f"page{i}.md"): f"# Page {i}\n\nSee [next](page{i + 1}.md)." for i in range(20)}
+        self.pages["index.md"] = "# Home\n\n- **bold**\n- _italic_"
+        for path, source in self.pages.items():
+            full_path = os.path.join(self.content_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as page_file:
+                page_file.write(source)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_outputs(self, out_dir):
+        outputs = {}
+        for root, _, files in os.walk(out_dir):
+            for name in files:
+                with open(os.path.join(root, name)) as html_file:
+                    outputs[os.path.relpath(os.path.join(root, name), out_dir)] = html_file.read()
+        return outputs
+
+    def test_matches_build(self):
+        serial_dir = os.path.join(self.temp_dir.name, "serial")
+        expected = build(self.content_dir, serial_dir, workers=1)
+        written = asyncio.run(build_async(self.content_dir, self.out_dir, workers=1, io_concurrency=3, queue_size=2))
+        self.assertListEqual(expected, written)
+        self.assertDictEqual(self.read_outputs(serial_dir), self.read_outputs(self.out_dir))
+
+    def test_unchanged_outputs_not_rewritten(self):
+        asyncio.run(build_async(self.content_dir, self.out_dir, workers=1))
+        destination = os.path.join(self.out_dir, "index.html")
+        os.utime(destination, ns=(1, 1))
+        asyncio.run(build_async(self.content_dir, self.out_dir, workers=1))
+        self.assertEqual(1, os.stat(destination).st_mtime_ns)
+
+    def test_incremental_with_index(self):
+        index_path = os.path.join(self.temp_dir.name, "index.json")
+        self.assertEqual(21, len(asyncio.run(build_async(self.content_dir, self.out_dir, workers=1, index_path=index_path))))
+        self.assertListEqual([], asyncio.run(build_async(self.content_dir, self.out_dir, workers=1, index_path=index_path)))
+
+    def test_render_error_propagates(self):
+        with mock.patch("asyncbuild.render_page", side_effect=ValueError("render failed")), \
+                self.assertRaises(ValueError):
+            asyncio.run(build_async(self.content_dir, self.out_dir, workers=1, io_concurrency=2, queue_size=1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+import unittest
+
+from benchmark import compare_results
+
+class TestBenchmark(unittest.TestCase):
+    def test_compare_results_flags_slowdowns(self):
+        baseline = {"pipeline/pages=10/to_html": 1.0, "pipeline/pages=10/text_to_textnodes": 2.0}
+        current = {"pipeline/pages=10/to_html": 1.5, "pipeline/pages=10/text_to_textnodes": 2.1, "new/metric": 9.0}
+        regressions = compare_results(current, baseline, 1.25)
+        self.assertListEqual([("pipeline/pages=10/to_html", 1.0, 1.5, 1.5)], regressions)
+
+    def test_compare_results_no_baseline(self):
+        self.assertListEqual([], compare_results({"a": 1.0}, {}, 1.1))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,258 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from build import build, find_markdown_files, make_batches, output_path, stream_page, write_output
+from corpus import iter_large_document_lines
+from markdown import markdown_to_html
+from output import stream_output
+from linkindex import LinkIndex
+from profiling import Profiler
+from search import extract_search_entry
+
+class TestBuild(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.content_dir = os.path.join(self.temp_dir.name, "content")
+        self.out_dir = os.path.join(self.temp_dir.name, "public")
+        self.pages = {
+            "index.md": "# Home\n\nWelcome to the **site**.",
+            os.path.join("blog", "first.md"): "# First\n\n- a\n- b",
+            os.path.join("blog", "second.md"): "# Second\n\n> quoted",
+            "notes.txt": "not markdown",
+        }
+        for path, source in self.pages.items():
+            full_path = os.path.join(self.content_dir, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, "w") as page_file:
+                page_file.write(source)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read_output(self, path):
+        with open(os.path.join(self.out_dir, path)) as html_file:
+            return html_file.read()
+
+    def test_find_markdown_files_sorted(self):
+        expected = [os.path.join("blog", "first.md"), os.path.join("blog", "second.md"), "index.md"]
+        self.assertListEqual(expected, find_markdown_files(self.content_dir))
+
+    def test_output_path(self):
+        self.assertEqual(os.path.join("blog", "first.html"), output_path(os.path.join("blog", "first.md")))
+
+    def test_write_output_skips_identical(self):
+        destination = os.path.join(self.out_dir, "page.html")
+        self.assertTrue(write_output(destination, "<div>a</div>"))
+        os.utime(destination, ns=(1, 1))
+        self.assertFalse(write_output(destination, "<div>a</div>"))
+        self.assertEqual(1, os.stat(destination).st_mtime_ns)
+        self.assertTrue(write_output(destination, "<div>b</div>"))
+        self.assertEqual("<div>b</div>", self.read_output("page.html"))
+        self.assertListEqual(["page.html"], os.listdir(self.out_dir))
+
+    def test_build_source_maps(self):
+        build(self.content_dir, self.out_dir, workers=1, source_maps=True)
+        with open(os.path.join(self.out_dir, "index.html.map")) as map_file:
+            source_map = json.load(map_file)
+        self.assertEqual("index.md", source_map["source"])
+        self.assertListEqual([[1, 1, 1, 6], [3, 1, 3, 24]], [block["source"] for block in source_map["blocks"]])
+        self.assertEqual("<div><h1>Home</h1><p>Welcome to the <b>site</b>.</p></div>", self.read_output("index.html"))
+        self.assertTrue(os.path.exists(os.path.join(self.out_dir, "blog", "first.html.map")))
+
+    def test_stream_output_skips_identical(self):
+        destination = os.path.join(self.out_dir, "page.html")
+        write = lambda chunks: lambda write: [write(chunk) for chunk in chunks]
+        self.assertTrue(stream_output(destination, write(["<div>", "a", "</div>"])))
+        os.utime(destination, ns=(1, 1))
+        self.assertFalse(stream_output(destination, write(["<div>a", "</div>"])))
+        self.assertEqual(1, os.stat(destination).st_mtime_ns)
+        self.assertTrue(stream_output(destination, write(["<div>b</div>"])))
+        self.assertEqual("<div>b</div>", self.read_output("page.html"))
+        self.assertListEqual(["page.html"], os.listdir(self.out_dir))
+
+    def test_stream_page_matches_render(self):
+        source_path = os.path.join(self.temp_dir.name, "large.md")
+        with open(source_path, "w") as source_file:
+            source_file.writelines(iter_large_document_lines(5, 50_000))
+        destination = os.path.join(self.out_dir, "large.html")
+        stamp, references, entry = stream_page(source_path, destination, collect_references=True, collect_search=True)
+        with open(source_path) as source_file:
+            source = source_file.read()
+        self.assertEqual(markdown_to_html(source), self.read_output("large.html"))
+        self.assertEqual(len(source), stamp[1])
+        self.assertGreater(len(references[0]), 0)
+        self.assertGreater(len(entry["headings"]), 1)
+        self.assertEqual(extract_search_entry(source), entry)
+
+    def test_build_streams_large_pages(self):
+        expected = os.path.join(self.temp_dir.name, "expected")
+        build(self.content_dir, expected, workers=1)
+        with mock.patch("build.STREAM_BYTES", 0):
+            build(self.content_dir, self.out_dir, workers=1, index_path=os.path.join(self.temp_dir.name, "index.json"),
+                search_path=os.path.join(self.temp_dir.name, "search.json"))
+        for path in ("index.html", os.path.join("blog", "first.html")):
+            with open(os.path.join(expected, path)) as html_file:
+                self.assertEqual(html_file.read(), self.read_output(path))
+
+    # Streams a generated page of STREAM_TEST_MB megabytes (default 500) in
+    # a child process and checks its peak resident memory. Slow, so only
+    # run when STREAM_TEST_MB is set.
+    @unittest.skipUnless(os.environ.get("STREAM_TEST_MB"), "set STREAM_TEST_MB to stream a large page")
+    def test_stream_page_memory_ceiling(self):
+        size = int(os.environ.get("STREAM_TEST_MB") or 500) * 1_000_000
+        source_path = os.path.join(self.temp_dir.name, "huge.md")
+        with open(source_path, "w") as source_file:
+            source_file.writelines(iter_large_document_lines(11, size))
+        script = (
+            "import resource, sys\n"
+            "from build import stream_page\n"
+            "stream_page(sys.argv[1], sys.argv[2])\n"
+            "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+        )
+        destination = os.path.join(self.out_dir, "huge.html")
+        result = subprocess.run([sys.executable, "-c", script, source_path, destination], check=True,
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        peak_kb = int(result.stdout)
+        self.assertGreater(os.path.getsize(destination), size)
+        self.assertLess(peak_kb, 100 * 1024)
+
+    def test_build_with_template(self):
+        template_dir = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(template_dir)
+        template_path = os.path.join(template_dir, "page.html")
+        with open(template_path, "w") as template_file:
+            template_file.write("<title>{{ title }}</title>{{ content }}{{> footer.html }}")
+        footer_path = os.path.join(template_dir, "footer.html")
+        with open(footer_path, "w") as footer_file:
+            footer_file.write("<footer></footer>")
+        index_path = os.path.join(self.temp_dir.name, "index.json")
+        build(self.content_dir, self.out_dir, workers=1, index_path=index_path, template_path=template_path)
+        self.assertEqual("<title>Home</title><div><h1>Home</h1><p>Welcome to the <b>site</b>.</p></div><footer></footer>",
+            self.read_output("index.html"))
+        self.assertListEqual([], build(self.content_dir, self.out_dir, workers=1, index_path=index_path,
+            template_path=template_path))
+
+        with open(footer_path, "w") as footer_file:
+            footer_file.write("<footer>new</footer>")
+        os.utime(footer_path, ns=(1, 1))
+        self.assertEqual(3, len(build(self.content_dir, self.out_dir, workers=2, index_path=index_path,
+            template_path=template_path)))
+        self.assertTrue(self.read_output(os.path.join("blog", "first.html")).endswith("<footer>new</footer>"))
+        self.assertListEqual([], LinkIndex.load(index_path).broken_links())
+
+        self.assertEqual(3, len(build(self.content_dir, self.out_dir, workers=1, index_path=index_path)))
+        self.assertEqual("<div><h1>Home</h1><p>Welcome to the <b>site</b>.</p></div>", self.read_output("index.html"))
+
+        with mock.patch("build.STREAM_BYTES", 0):
+            build(self.content_dir, self.out_dir, workers=1, template_path=template_path)
+        self.assertTrue(self.read_output("index.html").startswith("<title>Home</title><div><h1>Home</h1>"))
+
+        build(self.content_dir, self.out_dir, workers=1, source_maps=True, template_path=template_path)
+        with open(os.path.join(self.out_dir, "index.html.map")) as map_file:
+            start, end = json.load(map_file)["blocks"][0]["html"]
+        self.assertEqual("<h1>Home</h1>", self.read_output("index.html")[start:end])
+
+    def test_build_reports_unpaired_delimiters(self):
+        with open(os.path.join(self.content_dir, "blog", "second.md"), "a") as page_file:
+            page_file.write("\n\nsome **open\n  and _this")
+        expected = [(os.path.join("blog", "second.md"), 5, 6, 'Encountered unpaired "**" delimiter'),
+            (os.path.join("blog", "second.md"), 6, 7, 'Encountered unpaired "_" delimiter')]
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        for options in ({"workers": 1, "cache_dir": cache_dir}, {"workers": 1, "cache_dir": cache_dir},
+                {"workers": 2}, {"workers": 1, "source_maps": True}, {"workers": 1, "profiler": Profiler()}):
+            errors = []
+            build(self.content_dir, self.out_dir, errors=errors, **options)
+            self.assertListEqual(expected, errors)
+        errors = []
+        with mock.patch("build.STREAM_BYTES", 0):
+            build(self.content_dir, self.out_dir, workers=1, errors=errors)
+        self.assertListEqual(expected, errors)
+
+    def test_build_reports_links_without_url(self):
+        with open(os.path.join(self.content_dir, "blog", "second.md"), "a") as page_file:
+            page_file.write("\n\nsee [docs]() here")
+        errors = []
+        written = build(self.content_dir, self.out_dir, workers=1, errors=errors)
+        self.assertIn(os.path.join("blog", "second.html"), written)
+        self.assertIn("<p>see [docs]() here</p>", self.read_output(os.path.join("blog", "second.html")))
+        self.assertListEqual([(os.path.join("blog", "second.md"), 5, 10, "Link has no url")], errors)
+
+    def test_make_batches_covers_all_paths(self):
+        paths = find_markdown_files(self.content_dir)
+        batches = make_batches(self.content_dir, paths, workers=1, batch_bytes=20)
+        self.assertGreater(len(batches), 1)
+        self.assertListEqual(paths, [path for batch in batches for path in batch])
+
+    def test_build_single_worker(self):
+        written = build(self.content_dir, self.out_dir, workers=1)
+        self.assertListEqual([os.path.join("blog", "first.html"), os.path.join("blog", "second.html"), "index.html"], written)
+        self.assertEqual("<div><h1>Home</h1><p>Welcome to the <b>site</b>.</p></div>", self.read_output("index.html"))
+
+    def test_build_parallel_matches_serial(self):
+        serial = build(self.content_dir, self.out_dir, workers=1)
+        serial_html = [self.read_output(path) for path in serial]
+        parallel = build(self.content_dir, self.out_dir, workers=2)
+        self.assertListEqual(serial, parallel)
+        self.assertListEqual(serial_html, [self.read_output(path) for path in parallel])
+
+    def test_build_with_cache(self):
+        cache_dir = os.path.join(self.temp_dir.name, "cache")
+        build(self.content_dir, self.out_dir, workers=1, cache_dir=cache_dir)
+        build(self.content_dir, self.out_dir, workers=1, cache_dir=cache_dir)
+        self.assertEqual("<div><h1>Second</h1><blockquote>quoted</blockquote></div>", self.read_output(os.path.join("blog", "second.html")))
+
+    def test_build_with_profiler(self):
+        profiler = Profiler()
+        build(self.content_dir, self.out_dir, workers=2, profiler=profiler)
+        self.assertEqual(3, profiler.stages["markdown_to_blocks"][1])
+        self.assertListEqual(sorted(find_markdown_files(self.content_dir)), sorted(profiler.pages))
+
+    def test_profiler_times_streamed_pages(self):
+        profiler = Profiler()
+        with mock.patch("build.STREAM_BYTES", 0):
+            build(self.content_dir, self.out_dir, workers=1, profiler=profiler)
+        self.assertListEqual(sorted(find_markdown_files(self.content_dir)), sorted(profiler.pages))
+
+    def test_incremental_build_with_index(self):
+        index_path = os.path.join(self.temp_dir.name, "index.json")
+        self.assertEqual(3, len(build(self.content_dir, self.out_dir, workers=1, index_path=index_path)))
+        self.assertListEqual([], build(self.content_dir, self.out_dir, workers=1, index_path=index_path))
+
+        with open(os.path.join(self.content_dir, "index.md"), "a") as page_file:
+            page_file.write("\n\nSee [the first post](blog/first.md)")
+        os.remove(os.path.join(self.content_dir, "blog", "second.md"))
+        self.assertListEqual(["index.html"], build(self.content_dir, self.out_dir, workers=2, index_path=index_path))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "blog", "second.html")))
+
+        index = LinkIndex.load(index_path)
+        self.assertListEqual(["index.md"], index.dependents("blog/first.html"))
+        self.assertListEqual([os.path.join("blog", "first.md"), "index.md"], sorted(index.pages))
+
+    def test_search_index_follows_incremental_build(self):
+        index_path = os.path.join(self.temp_dir.name, "index.json")
+        search_path = os.path.join(self.temp_dir.name, "search.json")
+        build(self.content_dir, self.out_dir, workers=1, index_path=index_path, search_path=search_path)
+        with open(os.path.join(self.out_dir, "search", "blog.json")) as shard_file:
+            shard = json.load(shard_file)
+        self.assertListEqual(["blog/first.html", "blog/second.html"], [page["url"] for page in shard["pages"]])
+        self.assertListEqual([1, 1], shard["postings"]["quoted"])
+        root_shard = os.path.join(self.out_dir, "search", "_root.json")
+        os.utime(root_shard, ns=(1, 1))
+
+        os.remove(os.path.join(self.content_dir, "blog", "second.md"))
+        with open(os.path.join(self.content_dir, "blog", "first.md"), "a") as page_file:
+            page_file.write("\n\nquoted again")
+        build(self.content_dir, self.out_dir, workers=1, index_path=index_path, search_path=search_path)
+        with open(os.path.join(self.out_dir, "search", "blog.json")) as shard_file:
+            shard = json.load(shard_file)
+        self.assertListEqual(["blog/first.html"], [page["url"] for page in shard["pages"]])
+        self.assertListEqual([0, 1], shard["postings"]["quoted"])
+        self.assertEqual(1, os.stat(root_shard).st_mtime_ns)
+
+if __name__ == "__main__":
+    unittest.main()
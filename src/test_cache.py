@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from cache import RenderCache
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_render_miss_then_hit(self):
+        calls = []
+        def render(source):
+            calls.append(source)
+            return f"<p>{source}</p>"
+
+        cache = RenderCache(self.cache_dir)
+        self.assertEqual("<p>page</p>", cache.render("page", render))
+        self.assertEqual("<p>page</p>", cache.render("page", render))
+        self.assertListEqual(["page"], calls)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_default_renderer(self):
+        cache = RenderCache(self.cache_dir)
+        self.assertEqual("<div><h1>Title</h1></div>", cache.render("# Title"))
+
+    def test_persists_between_instances(self):
+        RenderCache(self.cache_dir).put("page", "<p>cached</p>")
+        cache = RenderCache(self.cache_dir)
+        self.assertEqual("<p>cached</p>", cache.get("page"))
+
+    def test_salt_change_invalidates(self):
+        RenderCache(self.cache_dir, salt="template-a").put("page", "<p>old</p>")
+        cache = RenderCache(self.cache_dir, salt="template-b")
+        self.assertIsNone(cache.get("page"))
+        self.assertListEqual([cache.version], os.listdir(self.cache_dir))
+
+    def test_keeps_directories_it_did_not_make(self):
+        unrelated = os.path.join(self.cache_dir, "0123456789abcdef")
+        os.makedirs(unrelated)
+        named_like_a_version = os.path.join(self.cache_dir, "notes-for-today!")
+        os.makedirs(named_like_a_version)
+        old = RenderCache(self.cache_dir, salt="old")
+        cache = RenderCache(self.cache_dir, salt="new")
+        self.assertListEqual(sorted(["0123456789abcdef", "notes-for-today!", cache.version]), sorted(os.listdir(self.cache_dir)))
+        self.assertFalse(os.path.exists(old.directory))
+
+    def test_entry_evicted_while_read_is_a_miss(self):
+        cache = RenderCache(self.cache_dir)
+        cache.put("page", "<p>cached</p>")
+        with mock.patch("os.utime", side_effect=FileNotFoundError):
+            self.assertIsNone(cache.get("page"))
+        self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    def test_size_bound_is_shared_between_processes(self):
+        first = RenderCache(self.cache_dir, max_bytes=16)
+        second = RenderCache(self.cache_dir, max_bytes=16)
+        for index in range(4):
+            first.put(f"a{index}", "aaaa")
+            second.put(f"b{index}", "bbbb")
+        sizes = [entry.stat().st_size for entry in os.scandir(second.directory) if entry.name.endswith(".html")]
+        self.assertLessEqual(sum(sizes), 16)
+
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(self.cache_dir, max_bytes=10)
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+        cache.put("c", "cccc")
+        self.assertEqual("aaaa", cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual("cccc", cache.get("c"))
+        self.assertLessEqual(cache.total_bytes, 10)
+
+if __name__ == "__main__":
+    unittest.main()
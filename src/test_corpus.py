@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from corpus import iter_large_document_lines, make_document, make_nested_tree, make_site
+from markdown import extract_markdown_links, markdown_to_html
+
+class TestCorpus(unittest.TestCase):
+    def test_make_site_reproducible(self):
+        self.assertListEqual(make_site(42, 3), make_site(42, 3))
+        self.assertNotEqual(make_site(42, 3), make_site(43, 3))
+
+    def test_link_density(self):
+        sparse = make_document(random.Random(1), paragraphs=1, paragraph_words=1000, link_density=0.0, list_items=0)
+        dense = make_document(random.Random(1), paragraphs=1, paragraph_words=1000, link_density=0.5, list_items=0)
+        self.assertListEqual([], extract_markdown_links(sparse))
+        self.assertGreater(len(extract_markdown_links(dense)), 400)
+
+    def test_documents_render(self):
+        for document in make_site(7, 5, list_items=20):
+            self.assertTrue(markdown_to_html(document).startswith("<div><h1>"))
+
+    def test_iter_large_document_lines(self):
+        lines = list(iter_large_document_lines(3, 20_000))
+        document = "".join(lines)
+        self.assertGreaterEqual(len(document), 20_000)
+        self.assertLess(len(document), 40_000)
+        self.assertEqual(document, "".join(iter_large_document_lines(3, 20_000)))
+        self.assertGreater(markdown_to_html(document).count("<h1>"), 1)
+
+    def test_make_nested_tree_depth(self):
+        html = make_nested_tree(50).to_html()
+        self.assertEqual(50, html.count("<div"))
+        self.assertIn("<p><b>deep</b> text</p>", html)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import random
+import unittest
+
+from corpus import make_site
+from flatdoc import FlatDocument
+from markdown import markdown_to_blocks, markdown_to_html, text_to_textnodes
+from textnode import TextNode, TextType
+
+# Short documents of markup pieces, many with spans that run across a
+# line break.
+def make_fragments(seed, count):
+    rng = random.Random(seed)
+    pieces = ["a", "\\*", "\\_", "snake_case", "***", "_", " _", "_ ", "<&\"", " ", "**", "`x`", "`", "[l](u)", "[", "](",
+        "![", "\n", "\n  ", "\n> ", "b c", "# ", "- "]
+    return ["".join(rng.choice(pieces) for _ in range(rng.randint(1, 16))) for _ in range(count)]
+
+class TestFlatDocument(unittest.TestCase):
+    def test_matches_markdown_to_html(self):
+        documents = make_site(5, 10, list_items=7) + [
+            "# a **b\nc** d\n\n> q _x\n>\n> y_ z\n\n```py\nx\n```",
+            "1. **a** [l](u)\n2. b\n\n- ![i](v) t\n\npara **bold\nmore** end",
+            "  indented\n   lines **here**  \n\n\n\n#### h\n",
+            "#\nb",
+            "text\n```py\n  a < b\n\n  c\n```\n````\n```\n````\n\n```\nunclosed\n\n- x",
+            "a < b & c\n\n`<br>` [x](/q?a=1&b=2) ![\"i\"](i.png)\n\n```\n<pre>\n```",
+            "a ``` ```b\n\nmore",
+            "",
+        ] + make_fragments(0, 2000)
+        for document in documents:
+            self.assertEqual(markdown_to_html(document), FlatDocument(document).to_html())
+
+    def test_spans_across_lines(self):
+        md = "a `code\n  span` b\n\n> [a\n> b](c\n>  d) **e"
+        document = FlatDocument(md)
+        self.assertEqual("<div><p>a <code>code span</code> b</p><blockquote><a href=\"c d\">a b</a> **e</blockquote></div>",
+            document.to_html())
+        self.assertEqual(markdown_to_html(md), document.to_html())
+        self.assertEqual("code span", document.span_text(1))
+        self.assertEqual("code\n  span", md[document.span_starts[1]:document.span_ends[1]])
+        self.assertListEqual([md.index("**")], [error.offset for error in document.errors])
+
+    def test_block_text(self):
+        md = "# Title\n\n  first line\nsecond line  \n\n- a\n- b"
+        document = FlatDocument(md)
+        self.assertListEqual(markdown_to_blocks(md), [document.block_text(block) for block in range(len(document))])
+        md = "```\n  a\n\nb\n  ```\nafter"
+        document = FlatDocument(md)
+        self.assertListEqual(markdown_to_blocks(md), [document.block_text(block) for block in range(len(document))])
+
+    def test_arrays_hold_offsets(self):
+        md = "**bold** and [link](https://boot.dev)"
+        document = FlatDocument(md)
+        self.assertListEqual([0, 1], list(document.block_lines))
+        self.assertEqual(3, len(document.span_types))
+        self.assertEqual("bold", document.span_text(0))
+        self.assertEqual(" and ", document.span_text(1))
+        self.assertEqual("https://boot.dev", document.span_url(2))
+        self.assertIsNone(document.span_url(0))
+
+    def test_iter_text_nodes(self):
+        md = "This is **bold\nacross lines** with `code` and ![img](a.png)"
+        self.assertListEqual(text_to_textnodes(md.replace("\n", " ")), list(FlatDocument(md).iter_text_nodes(0)))
+
+    def test_iter_text_nodes_list_and_code(self):
+        document = FlatDocument("- _a_\n- b\n\n```\ncode\n```")
+        self.assertListEqual([TextNode("a", TextType.ITALIC), TextNode("b", TextType.TEXT)], list(document.iter_text_nodes(0)))
+        self.assertListEqual([TextNode("code\n", TextType.CODE)], list(document.iter_text_nodes(1)))
+
+    def test_text_node_spans(self):
+        md = "# Title\n\nSome **bold\ntext** and [a link](u)\n\n- _x_\n\n```\ncode\n```"
+        document = FlatDocument(md)
+        nodes = [node for block in range(len(document)) for node in document.iter_text_nodes(block)]
+        self.assertListEqual(["Title", "Some ", "bold\ntext", " and ", "a link", "x", "code\n"],
+            [md[slice(*node.span)] for node in nodes])
+
+    def test_block_span(self):
+        md = "  # Title\n\npara\n  more  \n\n```\nx\n```\n"
+        document = FlatDocument(md)
+        self.assertListEqual(["# Title", "para\n  more", "```\nx\n```"],
+            [md[slice(*document.block_span(block))] for block in range(len(document))])
+
+    def test_write_html(self):
+        sink = io.StringIO()
+        FlatDocument("## Heading").write_html(sink)
+        self.assertEqual("<div><h2>Heading</h2></div>", sink.getvalue())
+
+    def test_unpaired_delimiter(self):
+        document = FlatDocument("a **b\n\nc** d")
+        self.assertEqual("<div><p>a **b</p><p>c** d</p></div>", document.to_html())
+        self.assertListEqual([2, 8], [error.offset for error in document.errors])
+
+    def test_nested_emphasis_across_lines(self):
+        md = "_a **b\nc** d_ snake_case"
+        self.assertEqual("<div><p><i>a </i><b><i>b c</i></b><i> d</i> snake_case</p></div>", FlatDocument(md).to_html())
+        self.assertEqual(markdown_to_html(md), FlatDocument(md).to_html())
+
+if __name__ == "__main__":
+    unittest.main()
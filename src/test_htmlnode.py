@@ -1,6 +1,8 @@
+import io
+import pickle
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, escape_attribute, escape_text
 
 class TestHTMLNode(unittest.TestCase):
     def test_constructor(self):
@@ -89,5 +91,76 @@ class TestHTMLNode(unittest.TestCase):
         self.assertRaises(ValueError, node_children_empty.to_html)
         self.assertRaises(ValueError, node_children_none.to_html)
 
+    def test_no_instance_dict(self):
+        for node in (HTMLNode("p"), LeafNode("b", "x"), ParentNode("p", [LeafNode("b", "x")])):
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_iter_html_chunks(self):
+        node = ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")], {"class": "intro"})
+        self.assertListEqual(['<p class="intro">', "<b>bold</b>", " text", "</p>"], list(node.iter_html()))
+
+    def test_write_html(self):
+        node = ParentNode("div", [ParentNode("span", [LeafNode("i", "x")]), LeafNode(None, "y")])
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(node.to_html(), sink.getvalue())
+        self.assertEqual("<div><span><i>x</i></span>y</div>", sink.getvalue())
+
+    def test_count_nodes(self):
+        node = ParentNode("div", [ParentNode("span", [LeafNode("i", "x")]), LeafNode(None, "y")])
+        self.assertEqual(4, node.count_nodes())
+        self.assertEqual(1, LeafNode("b", "x").count_nodes())
+
+    def test_escape_text(self):
+        plain = "nothing to escape"
+        self.assertIs(plain, escape_text(plain))
+        self.assertEqual("a &lt;b&gt; &amp;amp; \"c\"", escape_text('a <b> &amp; "c"'))
+
+    def test_escape_attribute(self):
+        plain = "https://www.boot.dev"
+        self.assertIs(plain, escape_attribute(plain))
+        self.assertEqual("/search?q=&quot;a&quot;&amp;b=&lt;c&gt;", escape_attribute('/search?q="a"&b=<c>'))
+        self.assertEqual('<img width="100" src="a.png"></img>', LeafNode("img", "", {"width": 100, "src": "a.png"}).to_html())
+
+    def test_leaf_to_html_escapes(self):
+        node = LeafNode("a", "1 < 2 & 3", {"href": '/x?a=1&b="2"'})
+        self.assertEqual('<a href="/x?a=1&amp;b=&quot;2&quot;">1 &lt; 2 &amp; 3</a>', node.to_html())
+        self.assertEqual("&lt;script&gt;", LeafNode(None, "<script>").to_html())
+
+    def test_props_html_cached(self):
+        node = ParentNode("p", [LeafNode(None, "x")], {"class": "intro", "id": "first"})
+        self.assertEqual(' class="intro" id="first"', node.tag_props_html())
+        self.assertIs(node.tag_props_html(), node.tag_props_html())
+        self.assertEqual('class="intro" id="first"', node.props_to_html())
+        self.assertEqual("", LeafNode("b", "x").tag_props_html())
+
+    def test_props_html_follows_new_props(self):
+        node = LeafNode("a", "x", {"href": "/a"})
+        self.assertEqual('<a href="/a">x</a>', node.to_html())
+        node.props = {"href": "/c"}
+        self.assertEqual('<a href="/c">x</a>', node.to_html())
+        node.props = None
+        self.assertEqual("<a>x</a>", node.to_html())
+
+    def test_props_cannot_change_in_place(self):
+        props = {"href": "/a"}
+        node = LeafNode("a", "x", props)
+        props["href"] = "/b"
+        with self.assertRaises(TypeError):
+            node.props["href"] = "/c"
+        with self.assertRaises(TypeError):
+            node.props.update(href="/c")
+        self.assertEqual('<a href="/a">x</a>', node.to_html())
+        self.assertEqual({"href": "/a"}, pickle.loads(pickle.dumps(node.props)))
+
+    def test_to_html_deeply_nested(self):
+        depth = 5000
+        node = LeafNode("i", "deep")
+        for _ in range(depth):
+            node = ParentNode("blockquote", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<blockquote>" * depth + "<i>deep</i>"))
+        self.assertTrue(html.endswith("</blockquote>" * depth))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from linkindex import LinkIndex, extract_references, page_url_path, resolve_target
+
+class TestLinkIndex(unittest.TestCase):
+    def test_extract_references_skips_code(self):
+        md = "See [docs](/docs) and ![logo](/logo.png)\n\n```\n[not](a-link)\n```\n\n- [item](item.md)"
+        links, images = extract_references(md)
+        self.assertListEqual(["/docs", "item.md"], links)
+        self.assertListEqual(["/logo.png"], images)
+
+    def test_extract_references_as_rendered(self):
+        md = "Use `[x](missing)` and \\[y](not-a-link)\n\n> [q](quoted.md)\n\n1. ![i](item.png) `![c](code.png)`"
+        links, images = extract_references(md)
+        self.assertListEqual(["quoted.md"], links)
+        self.assertListEqual(["item.png"], images)
+
+    def test_page_url_path(self):
+        self.assertEqual("blog/first.html", page_url_path(os.path.join("blog", "first.md")))
+
+    def test_resolve_target(self):
+        page = os.path.join("blog", "first.md")
+        self.assertEqual("blog/second.html", resolve_target(page, "second.md"))
+        self.assertEqual("blog/second.html", resolve_target(page, "second#intro"))
+        self.assertEqual("about.html", resolve_target(page, "/about"))
+        self.assertEqual("about.html", resolve_target(page, "../about.html"))
+        self.assertEqual("blog/index.html", resolve_target(page, "/blog/"))
+        self.assertEqual("index.html", resolve_target(page, "/"))
+        self.assertEqual("images/logo.png", resolve_target(page, "/images/logo.png"))
+        self.assertIsNone(resolve_target(page, "https://boot.dev"))
+        self.assertIsNone(resolve_target(page, "#top"))
+
+    def test_referrers_and_update(self):
+        index = LinkIndex()
+        index.update("index.md", (1, 1), ["/about", "https://boot.dev"], ["/logo.png"])
+        index.update("blog.md", (1, 1), ["about"], [])
+        self.assertListEqual(["blog.md", "index.md"], index.dependents("about.html"))
+        self.assertListEqual(["index.md"], index.dependents("logo.png"))
+
+        index.update("index.md", (2, 1), [], [])
+        self.assertListEqual(["blog.md"], index.dependents("about.html"))
+        self.assertListEqual([], index.dependents("logo.png"))
+        index.remove("blog.md")
+        self.assertDictEqual({}, index.referrers)
+
+    def test_broken_links(self):
+        index = LinkIndex()
+        index.update("index.md", (1, 1), ["/about", "/missing"], ["/logo.png"])
+        index.update("about.md", (1, 1), ["/"], [])
+        self.assertListEqual([("index.md", "logo.png"), ("index.md", "missing.html")], index.broken_links())
+        with tempfile.TemporaryDirectory() as static_dir:
+            with open(os.path.join(static_dir, "logo.png"), "w") as image_file:
+                image_file.write("png")
+            self.assertListEqual([("index.md", "missing.html")], index.broken_links(static_dir))
+        index.update("about.md", (1, 1), ["/"], [], ["templates/page.html"])
+        self.assertListEqual([("index.md", "logo.png"), ("index.md", "missing.html")], index.broken_links())
+
+    def test_stale_pages_and_includes(self):
+        with tempfile.TemporaryDirectory() as content_dir:
+            for name in ("a.md", "b.md"):
+                with open(os.path.join(content_dir, name), "w") as page_file:
+                    page_file.write(name)
+            index = LinkIndex()
+            stat = os.stat(os.path.join(content_dir, "a.md"))
+            index.update("a.md", (stat.st_mtime_ns, stat.st_size), [], [], ["partials/footer.html"])
+            self.assertSetEqual({"b.md"}, index.stale_pages(content_dir, ["a.md", "b.md"]))
+            self.assertSetEqual({"a.md", "b.md"}, index.stale_pages(content_dir, ["a.md", "b.md"], ["partials/footer.html"]))
+
+    def test_save_and_load(self):
+        index = LinkIndex()
+        index.update("index.md", (1, 2), ["/about"], ["/logo.png"], ["footer.html"])
+        index.include_stamps["footer.html"] = 3
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.json")
+            index.save(path)
+            loaded = LinkIndex.load(path)
+            self.assertDictEqual(index.pages, loaded.pages)
+            self.assertDictEqual(index.referrers, loaded.referrers)
+            self.assertDictEqual({"footer.html": 3}, loaded.include_stamps)
+            self.assertListEqual(["footer.html"], loaded.changed_includes({"footer.html": 4}))
+            self.assertDictEqual({}, LinkIndex.load(os.path.join(directory, "missing.json")).pages)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from main import main, read_pairs
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.sources = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f"page{i}.md")
+            with open(path, "w") as page_file:
+                page_file.write(f"# Page {i}\n\nSome **text**.")
+            self.sources.append(path)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, path):
+        with open(path) as html_file:
+            return html_file.read()
+
+    def test_render_pairs(self):
+        outputs = [os.path.join(self.temp_dir.name, "out", f"page{i}.html") for i in range(2)]
+        self.assertIsNone(main(["render", self.sources[0], outputs[0], self.sources[1], outputs[1]]))
+        self.assertEqual("<div><h1>Page 1</h1><p>Some <b>text</b>.</p></div>", self.read(outputs[1]))
+
+    def test_render_pairs_file(self):
+        pairs_path = os.path.join(self.temp_dir.name, "pairs.tsv")
+        with open(pairs_path, "w") as pairs_file:
+            for source in self.sources:
+                pairs_file.write(f"{source}\t{source[:-3]}.html\n")
+        self.assertEqual([(source, f"{source[:-3]}.html") for source in self.sources], read_pairs(pairs_path))
+        main(["render", "--pairs", pairs_path])
+        self.assertEqual("<div><h1>Page 2</h1><p>Some <b>text</b>.</p></div>", self.read(self.sources[2][:-3] + ".html"))
+
+    def test_render_pairs_stdin(self):
+        destination = os.path.join(self.temp_dir.name, "stdin.html")
+        with mock.patch("sys.stdin", io.StringIO(f"{self.sources[0]}\t{destination}\n")):
+            main(["render", "--pairs", "-"])
+        self.assertTrue(self.read(destination).startswith("<div><h1>Page 0</h1>"))
+
+    def test_render_odd_paths(self):
+        with mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit):
+            main(["render", self.sources[0]])
+
+    def test_unpaired_delimiters_are_reported(self):
+        with open(self.sources[1], "a") as page_file:
+            page_file.write("\n\n- a **b")
+        destination = os.path.join(self.temp_dir.name, "page1.html")
+        with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            main(["render", self.sources[1], destination])
+        self.assertEqual(f'{self.sources[1]}:5:5: Encountered unpaired "**" delimiter\n', stderr.getvalue())
+
+        out_dir = os.path.join(self.temp_dir.name, "public")
+        for extra in ([], ["--async-io", "-j", "1"]):
+            with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr, mock.patch("sys.stdout", io.StringIO()):
+                main(["build", self.temp_dir.name, out_dir, *extra])
+            self.assertEqual(f'{self.sources[1]}:5:5: Encountered unpaired "**" delimiter\n', stderr.getvalue())
+
+    def test_render_does_not_import_build_modules(self):
+        destination = os.path.join(self.temp_dir.name, "page0.html")
+        script = (
+            "import sys, main\n"
+            f"main.main(['render', {self.sources[0]!r}, {destination!r}])\n"
+            "print([name for name in ('asyncio', 'http.server', 'concurrent.futures') if name in sys.modules])"
+        )
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, "-c", script], cwd=src_dir, capture_output=True, text=True, check=True)
+        self.assertEqual("[]", result.stdout.strip())
+
+if __name__ == "__main__":
+    unittest.main()
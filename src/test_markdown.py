@@ -1,8 +1,14 @@
+import io
+import tracemalloc
 import unittest
 
+from corpus import iter_large_document_lines, make_site
 from markdown import split_nodes_delimiter, extract_markdown_images, extract_markdown_links,\
-      split_nodes_image, split_nodes_link, text_to_textnodes, markdown_to_blocks, \
-      block_to_block_type, BlockType
+      split_nodes_image, split_nodes_link, text_to_textnodes, markdown_to_blocks, iter_markdown_blocks, \
+      block_to_block_type, BlockType, markdown_to_html_node, markdown_to_html, \
+      BlockCache, block_lines_to_block_type, iter_markdown_block_lines, iter_markdown_block_offsets, BLOCK_TO_HTML_NODE, LazyPattern, InlineError, FencedCode, \
+      write_markdown_html, text_origins
+from sourcemap import LineIndex
 from textnode import TextNode, TextType
 
 class TestHTMLNode(unittest.TestCase):
@@ -141,6 +147,31 @@ class TestHTMLNode(unittest.TestCase):
         actual = split_nodes_image([node])
         self.assertListEqual(expected, actual)
 
+    def test_split_link_duplicates(self):
+        node = TextNode("[a](u) and [a](u)", TextType.BOLD)
+        expected = [
+            TextNode("a", TextType.LINK, "u"),
+            TextNode(" and ", TextType.BOLD),
+            TextNode("a", TextType.LINK, "u"),
+        ]
+        actual = split_nodes_link([node])
+        self.assertListEqual(expected, actual)
+
+    def test_split_link_many(self):
+        text = " ".join(f"[{i}](https://example.com/{i})" for i in range(500))
+        actual = split_nodes_link([TextNode(text, TextType.TEXT)])
+        links = [node for node in actual if node.text_type == TextType.LINK]
+        self.assertEqual(999, len(actual))
+        self.assertEqual(TextNode("499", TextType.LINK, "https://example.com/499"), links[-1])
+
+    def test_split_link_keeps_url_nodes(self):
+        nodes = [
+            TextNode("image", TextType.IMAGE, "https://i.imgur.com/zjjcJKZ.png"),
+            TextNode("no links here", TextType.TEXT),
+        ]
+        actual = split_nodes_link(nodes)
+        self.assertListEqual(nodes, actual)
+
     def test_text_to_textnodes(self):
         text = 'This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)'
         expected = [
@@ -182,6 +213,129 @@ class TestHTMLNode(unittest.TestCase):
         actual = text_to_textnodes(text)
         self.assertListEqual(expected, actual)
 
+    def test_text_to_textnodes_nested_delimiters(self):
+        text = "**bold _and italic_ text**"
+        expected = [
+            TextNode("bold ", TextType.BOLD),
+            TextNode("and italic", TextType.BOLD_ITALIC),
+            TextNode(" text", TextType.BOLD),
+        ]
+        actual = text_to_textnodes(text)
+        self.assertListEqual(expected, actual)
+
+    def test_text_to_textnodes_code_is_literal(self):
+        text = "use `**kwargs` and `[a](b)` here"
+        expected = [
+            TextNode("use ", TextType.TEXT),
+            TextNode("**kwargs", TextType.CODE),
+            TextNode(" and ", TextType.TEXT),
+            TextNode("[a](b)", TextType.CODE),
+            TextNode(" here", TextType.TEXT),
+        ]
+        actual = text_to_textnodes(text)
+        self.assertListEqual(expected, actual)
+
+    def test_text_to_textnodes_link_in_bold(self):
+        text = "**see [docs](https://boot.dev)**"
+        expected = [
+            TextNode("see ", TextType.BOLD),
+            TextNode("docs", TextType.LINK, "https://boot.dev"),
+        ]
+        actual = text_to_textnodes(text)
+        self.assertListEqual(expected, actual)
+
+    def test_text_to_textnodes_unpaired(self):
+        errors = []
+        self.assertListEqual([TextNode("this **is not closed", TextType.TEXT)], text_to_textnodes("this **is not closed", errors))
+        self.assertListEqual([InlineError(5, 'Encountered unpaired "**" delimiter')], errors)
+        errors = []
+        self.assertListEqual([TextNode("a lone ` backtick", TextType.TEXT)], text_to_textnodes("a lone ` backtick", errors))
+        self.assertListEqual([InlineError(7, 'Encountered unpaired "`" delimiter')], errors)
+
+    def test_text_to_textnodes_intraword_underscores(self):
+        errors = []
+        text = "call snake_case_names and _this_ one"
+        expected = [
+            TextNode("call snake_case_names and ", TextType.TEXT),
+            TextNode("this", TextType.ITALIC),
+            TextNode(" one", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, text_to_textnodes(text, errors))
+        self.assertListEqual([], errors)
+
+    def test_text_to_textnodes_underscores_in_words(self):
+        errors = []
+        self.assertListEqual([TextNode("a_b_ and the __init__ method", TextType.TEXT)],
+            text_to_textnodes("a_b_ and the __init__ method", errors))
+        self.assertListEqual([], errors)
+
+    def test_text_to_textnodes_spans(self):
+        text = "a **bold** `code` [link](u) _x\\_y_"
+        nodes = text_to_textnodes(text)
+        self.assertListEqual(["a ", "bold", " ", "code", " ", "link", " ", "x\\_y"], [text[slice(*node.span)] for node in nodes])
+
+    def test_text_to_textnodes_spans_in_block(self):
+        md = "Intro\n\n> quoted **bold\n>   words** and `code`"
+        block = markdown_to_blocks(md)[1]
+        lines = block.split("\n")
+        parts = [line.lstrip(">").strip() for line in lines]
+        nodes = text_to_textnodes(" ".join(parts), origins=text_origins(lines, parts))
+        index = LineIndex(block)
+        self.assertListEqual([(1, 3, 1, 9), (1, 12, 2, 9), (2, 12, 2, 16), (2, 18, 2, 21)],
+            [index.span(*node.span) for node in nodes])
+
+    def test_text_to_textnodes_missing_url(self):
+        errors = []
+        expected = [TextNode("see [docs]() and ![chart]() here", TextType.TEXT)]
+        self.assertListEqual(expected, text_to_textnodes("see [docs]() and ![chart]() here", errors))
+        self.assertListEqual([InlineError(9, "Link has no url"), InlineError(24, "Image has no url")], errors)
+
+    def test_text_to_textnodes_nested(self):
+        expected = [
+            TextNode("a ", TextType.ITALIC),
+            TextNode("b", TextType.BOLD_ITALIC),
+            TextNode(" c", TextType.ITALIC),
+        ]
+        self.assertListEqual(expected, text_to_textnodes("_a **b** c_"))
+        expected = [
+            TextNode("a ", TextType.BOLD),
+            TextNode("b", TextType.BOLD_ITALIC),
+            TextNode(" c", TextType.BOLD),
+        ]
+        self.assertListEqual(expected, text_to_textnodes("**a _b_ c**"))
+
+    def test_text_to_textnodes_escapes(self):
+        self.assertListEqual([TextNode("2 * 3 = **6** and a_b", TextType.TEXT)], text_to_textnodes(r"2 * 3 = \*\*6\*\* and a\_b"))
+        self.assertListEqual([TextNode("a \\ b", TextType.TEXT)], text_to_textnodes("a \\ b"))
+
+    def test_text_to_textnodes_overlapping(self):
+        errors = []
+        expected = [TextNode("a **b", TextType.ITALIC), TextNode(" c**", TextType.TEXT)]
+        self.assertListEqual(expected, text_to_textnodes("_a **b_ c**", errors))
+        self.assertListEqual([3, 9], [error.offset for error in errors])
+
+    def test_text_to_textnodes_flanking(self):
+        self.assertListEqual([TextNode("a ** b _ c", TextType.TEXT)], text_to_textnodes("a ** b _ c"))
+        self.assertListEqual([TextNode("bold", TextType.BOLD), TextNode("italic", TextType.ITALIC)], text_to_textnodes("**bold**_italic_"))
+
+    def test_markdown_to_html_collects_errors(self):
+        errors = []
+        html = markdown_to_html("# Title\n\nthis **is not closed\n\n- fine _item_", BlockCache(), errors)
+        self.assertEqual("<div><h1>Title</h1><p>this **is not closed</p><ul><li>fine <i>item</i></li></ul></div>", html)
+        self.assertListEqual([InlineError(14, 'Encountered unpaired "**" delimiter')], errors)
+        self.assertNotEqual(InlineError(14, "x"), (14, "x"))
+
+    def test_errors_have_source_offsets(self):
+        md = "#  Title _open\n\n> quote\n>  more **x\n\n  - a\n  - b `c\n\n2. one\n3.  two _y\n\npara\n  next **z"
+        expected = [md.index("_open"), md.index("**x"), md.index("`c"), md.index("_y"), md.index("**z")]
+        cache = BlockCache()
+        for render in (lambda errors: markdown_to_html(md, None, errors), lambda errors: markdown_to_html(md, cache, errors),
+                lambda errors: markdown_to_html(md, cache, errors), lambda errors: markdown_to_html_node(md, errors),
+                lambda errors: markdown_to_html(io.StringIO(md), cache, errors)):
+            errors = []
+            render(errors)
+            self.assertListEqual(expected, [error.offset for error in errors])
+
     def test_markdown_to_blocks_multiple_blocks(self):
         md = """
 This is **bolded** paragraph
@@ -222,6 +376,26 @@ is considered a single block because there are no empty lines between.
         self.assertListEqual(expected, actual)
 
 
+    def test_iter_markdown_blocks_file(self):
+        source = io.StringIO("# Heading\n\nFirst line\n  second line  \n\n\n- item\n")
+        blocks = iter_markdown_blocks(source)
+        self.assertEqual("# Heading", next(blocks))
+        self.assertEqual("First line\nsecond line", next(blocks))
+        self.assertListEqual(["- item"], list(blocks))
+
+    def test_iter_markdown_block_offsets(self):
+        md = "# Heading\r\n\n  First line\n\tsecond line  \n\n\n- item"
+        blocks = list(iter_markdown_block_offsets(md))
+        self.assertListEqual(list(iter_markdown_block_lines(md)), [lines for lines, _ in blocks])
+        for lines, starts in blocks:
+            for line, start in zip(lines, starts):
+                self.assertTrue(md.startswith(line, start))
+        self.assertListEqual([0, 14, 26, 42], [start for _, starts in blocks for start in starts])
+
+    def test_iter_markdown_blocks_lines(self):
+        lines = iter(["a", "b", "", "c"])
+        self.assertListEqual(["a\nb", "c"], list(iter_markdown_blocks(lines)))
+
     def test_block_to_type_paragraph(self):
         block = "Plaintext without any special characters is treated as a basic paragraph.\nEven if it spans multiple lines."
 
@@ -270,5 +444,208 @@ is considered a single block because there are no empty lines between.
         result = block_to_block_type(block)
         self.assertEqual(BlockType.ORDERED_LIST, result)  
 
+    def test_block_to_type_digits_without_period(self):
+        block = "1x is not a list item\n2 nor is this"
+
+        result = block_to_block_type(block)
+        self.assertEqual(BlockType.PARAGRAPH, result)
+
+    def test_block_to_type_mixed_list_markers(self):
+        block = "- unordered item\n2. ordered item"
+
+        result = block_to_block_type(block)
+        self.assertEqual(BlockType.PARAGRAPH, result)
+
+    def test_block_lines_to_block_type(self):
+        md = "# Heading\n\n- a\n- b\n\n1. a\n2. b\n\n```\ncode\n```\n\nplain"
+        expected = [BlockType.HEADING, BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST, BlockType.CODE, BlockType.PARAGRAPH]
+        actual = [block_lines_to_block_type(lines) for lines in iter_markdown_block_lines(md)]
+        self.assertListEqual(expected, actual)
+
+    def test_markdown_to_html_node_paragraphs(self):
+        md = """
+This is **bolded** paragraph
+text in a p
+tag here
+
+This is another paragraph with _italic_ text and `code` here
+
+"""
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            "<div><p>This is <b>bolded</b> paragraph text in a p tag here</p><p>This is another paragraph with <i>italic</i> text and <code>code</code> here</p></div>",
+            html,
+        )
+
+    def test_markdown_to_html_node_blocks(self):
+        md = """
+## Heading
+
+```
+This is text that _should_ remain
+the **same** even with inline stuff
+```
+
+> A quote
+> over two lines
+
+- one
+- two
+
+1. first
+2. second
+"""
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            "<div><h2>Heading</h2>"
+            "<pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre>"
+            "<blockquote>A quote over two lines</blockquote>"
+            "<ul><li>one</li><li>two</li></ul>"
+            "<ol><li>first</li><li>second</li></ol></div>",
+            html,
+        )
+
+    def test_fenced_code_keeps_blank_lines_and_indentation(self):
+        md = "Intro\n```py\ndef f():\n\n    return 1 < 2\n```\nafter"
+        self.assertListEqual(["Intro", "```py\ndef f():\n\n    return 1 < 2\n```", "after"], markdown_to_blocks(md))
+        self.assertEqual("<div><p>Intro</p><pre><code>def f():\n\n    return 1 &lt; 2\n</code></pre><p>after</p></div>",
+            markdown_to_html(md))
+        self.assertEqual(markdown_to_html(md), markdown_to_html_node(md).to_html())
+
+    def test_fenced_code_is_a_slice(self):
+        md = "  ```\n  a\n\n  b\n  ```"
+        code = next(iter_markdown_block_lines(md))
+        self.assertIsInstance(code, FencedCode)
+        self.assertEqual(BlockType.CODE, block_lines_to_block_type(code))
+        self.assertListEqual(["```", "```"], code)
+        self.assertEqual((6, 15), (code.start, code.end))
+        self.assertEqual("  a\n\n  b\n", code.code())
+
+    def test_fenced_code_closing(self):
+        self.assertListEqual(["````\n```\n````", "x"], markdown_to_blocks("````\n```\n````\nx"))
+        self.assertListEqual(["```\na\n\nb"], markdown_to_blocks("```\na\n\nb\n\n"))
+        self.assertListEqual(["a ```b```", "```c```"], markdown_to_blocks("a ```b```\n```c```"))
+        self.assertEqual("<div><pre><code>c</code></pre></div>", markdown_to_html("```c```"))
+
+    def test_fences_inside_a_line(self):
+        for md in ("a ``` ```b\n\nmore", "Use `````` to fence\n\nmore", "x ``` y ``` z ```\n```\ncode\n```"):
+            expected = [block.code() if isinstance(block, FencedCode) else block for block in iter_markdown_block_lines(md)]
+            self.assertListEqual(expected,
+                [block.code() if isinstance(block, FencedCode) else block for block in iter_markdown_block_lines(io.StringIO(md))])
+            chunks = []
+            write_markdown_html(io.StringIO(md), chunks.append)
+            self.assertEqual(markdown_to_html(md), "".join(chunks))
+        self.assertEqual("<div><p>a <code> </code>b</p><p>more</p></div>", markdown_to_html("a ``` ```b\n\nmore"))
+        self.assertListEqual([["x ``` y ``` z ```"], "code\n"],
+            [block.code() if isinstance(block, FencedCode) else block
+                for block in iter_markdown_block_lines("x ``` y ``` z ```\n```\ncode\n```")])
+
+    def test_fenced_code_from_lines(self):
+        md = "text\n```\n  a\n\n```\n\n```\nopen\n"
+        expected = [block.code() if isinstance(block, FencedCode) else block for block in iter_markdown_block_lines(md)]
+        for lines in (io.StringIO(md), md.split("\n")):
+            self.assertListEqual(expected,
+                [block.code() if isinstance(block, FencedCode) else block for block in iter_markdown_block_lines(lines)])
+
+    def test_string_and_lines_scan_alike(self):
+        sources = ("```py   \ncode\n```  ", "text  \n  ```js \n  a\t\n\n```\n\n```x```  \n```\nopen  \n",
+            "para\fmore\r\n# head\x1c\x1c- item\r```\ncode\u2028```")
+        cases = [(md, io.StringIO(md)) for md in sources[:2]] + [(md, iter(md.splitlines(keepends=True))) for md in sources]
+        for md, lines in cases:
+            expected = list(iter_markdown_block_offsets(md))
+            actual = list(iter_markdown_block_offsets(lines))
+            self.assertListEqual([starts for _, starts in expected], [starts for _, starts in actual])
+            self.assertListEqual(
+                [(block.code(), block.text()) if isinstance(block, FencedCode) else block for block, _ in expected],
+                [(block.code(), block.text()) if isinstance(block, FencedCode) else block for block, _ in actual])
+        self.assertListEqual(["```py   \ncode\n```"], markdown_to_blocks("```py   \ncode\n```  "))
+        self.assertListEqual(["```py   \ncode\n```"], list(iter_markdown_blocks(io.StringIO("```py   \ncode\n```  "))))
+
+    def test_write_markdown_html_streams_blocks(self):
+        document = make_site(4, 1)[0]
+        chunks = []
+        write_markdown_html(io.StringIO(document), chunks.append)
+        self.assertGreater(len(chunks), 10)
+        self.assertEqual(markdown_to_html(document), "".join(chunks))
+
+    def test_write_markdown_html_memory_is_bounded(self):
+        lines = iter_large_document_lines(9, 200_000)
+        written = 0
+        def write(chunk):
+            nonlocal written
+            written += len(chunk)
+        tracemalloc.start()
+        try:
+            write_markdown_html(lines, write)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(written, 200_000)
+        self.assertLess(peak, 64 * 1024)
+
+    def test_every_block_type_has_html_node(self):
+        self.assertSetEqual(set(BlockType), set(BLOCK_TO_HTML_NODE))
+
+    def test_markdown_to_html_node_heading_levels(self):
+        html = markdown_to_html_node("### Third\n\n####### Too deep").to_html()
+        self.assertEqual("<div><h3>Third</h3><h6>Too deep</h6></div>", html)
+
+    def test_markdown_to_html(self):
+        md = "# Title\n\nSome [link](https://boot.dev)"
+        self.assertEqual(markdown_to_html_node(md).to_html(), markdown_to_html(md))
+        self.assertEqual("<div></div>", markdown_to_html(""))
+
+    def test_lazy_pattern(self):
+        pattern = LazyPattern(r"(\d+)-(\d+)")
+        self.assertNotIn("compiled", vars(pattern))
+        self.assertEqual(("1", "2"), pattern.match("1-2").groups())
+        self.assertIn("compiled", vars(pattern))
+        self.assertListEqual([("3", "4")], pattern.findall("a 3-4 b"))
+        self.assertEqual(2, pattern.groups)
+
+    def test_enum_members_hash_by_identity(self):
+        self.assertEqual(object.__hash__(BlockType.CODE), hash(BlockType.CODE))
+        self.assertEqual(object.__hash__(TextType.LINK), hash(TextType.LINK))
+        self.assertIs(BlockType.CODE, BlockType("code"))
+
+    def test_markdown_to_html_escapes(self):
+        md = "if a < b && c > d\n\n```\n<br>\n```\n\n[x](/q?a=1&b=2) ![\"alt\"](i.png)"
+        self.assertEqual(
+            "<div><p>if a &lt; b &amp;&amp; c &gt; d</p><pre><code>&lt;br&gt;\n</code></pre>"
+            '<p><a href="/q?a=1&amp;b=2">x</a> <img src="i.png" alt="&quot;alt&quot;"></img></p></div>',
+            markdown_to_html(md),
+        )
+
+    def test_block_cache_hits(self):
+        cache = BlockCache()
+        footer = "_Copyright Boot.dev_"
+        first = markdown_to_html(f"# Page one\n\n{footer}", cache)
+        second = markdown_to_html(f"# Page two\n\n{footer}", cache)
+        self.assertEqual(markdown_to_html(f"# Page two\n\n{footer}"), second)
+        self.assertTrue(first.endswith("<p><i>Copyright Boot.dev</i></p></div>"))
+        self.assertEqual((1, 3), (cache.hits, cache.misses))
+
+    def test_block_cache_keyed_by_type(self):
+        cache = BlockCache()
+        self.assertEqual("<p>- item</p>", cache.render("- item", BlockType.PARAGRAPH))
+        self.assertEqual("<ul><li>item</li></ul>", cache.render("- item", BlockType.UNORDERED_LIST))
+        self.assertEqual(0, cache.hits)
+
+    def test_block_cache_skips_code(self):
+        cache = BlockCache()
+        self.assertEqual("<div><pre><code>a\n</code></pre><pre><code>b\n</code></pre></div>",
+            markdown_to_html("```\na\n```\n\n```\nb\n```", cache))
+        self.assertEqual(0, len(cache.entries))
+
+    def test_block_cache_evicts(self):
+        cache = BlockCache(max_entries=2)
+        cache.render("a", BlockType.PARAGRAPH)
+        cache.render("b", BlockType.PARAGRAPH)
+        cache.render("a", BlockType.PARAGRAPH)
+        cache.render("c", BlockType.PARAGRAPH)
+        self.assertListEqual([("a", BlockType.PARAGRAPH), ("c", BlockType.PARAGRAPH)], list(cache.entries))
+        cache.clear()
+        self.assertEqual((0, 0, 0), (cache.hits, cache.misses, len(cache.entries)))
+
 if __name__ == "__main__":
     unittest.main()    
\ No newline at end of file
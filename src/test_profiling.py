@@ -0,0 +1,52 @@
+import io
+import unittest
+
+from markdown import BlockCache, markdown_to_html, write_markdown_html
+from profiling import Profiler
+
+class TestProfiler(unittest.TestCase):
+    def test_render_matches_markdown_to_html(self):
+        md = "# Title\n\nSome **bold** and a [link](https://boot.dev)\n\n- a\n- b\n\n```\ncode\n```"
+        profiler = Profiler()
+        self.assertEqual(markdown_to_html(md), markdown_to_html(md, profiler=profiler, path="page.md"))
+        chunks = []
+        write_markdown_html(io.StringIO(md), chunks.append, profiler=profiler, path="streamed.md")
+        self.assertEqual(markdown_to_html(md), "".join(chunks))
+        self.assertEqual(4, profiler.pages["streamed.md"][1])
+
+    def test_records_stages_and_nodes(self):
+        profiler = Profiler()
+        markdown_to_html("# Title\n\nSome **bold** text", profiler=profiler, path="page.md")
+        self.assertEqual([1, 2], profiler.stages["markdown_to_blocks"][1:])
+        self.assertEqual(2, profiler.stages["block_to_block_type"][1])
+        self.assertEqual(4, profiler.stages["text_to_textnodes"][2])
+        self.assertEqual(6, profiler.stages["to_html"][2])
+        self.assertEqual(2, profiler.pages["page.md"][1])
+
+    def test_block_cache_hits(self):
+        profiler = Profiler()
+        cache = BlockCache()
+        markdown_to_html("footer", cache, profiler=profiler, path="a.md")
+        markdown_to_html("footer", cache, profiler=profiler, path="b.md")
+        self.assertEqual(1, profiler.stages["block_cache_hit"][1])
+        self.assertEqual(1, cache.hits)
+
+    def test_keeps_slowest_blocks(self):
+        profiler = Profiler(top=3)
+        markdown_to_html("\n\n".join(f"paragraph {i}" for i in range(10)), profiler=profiler, path="page.md")
+        self.assertEqual(3, len(profiler.slow_blocks))
+
+    def test_merge_and_report(self):
+        first = Profiler()
+        markdown_to_html("# One", profiler=first, path="one.md")
+        second = Profiler()
+        markdown_to_html("# Two\n\ntext", profiler=second, path="two.md")
+        first.merge(second)
+        self.assertEqual(2, first.stages["markdown_to_blocks"][1])
+        report = first.report()
+        self.assertIn("slowest pages", report)
+        self.assertIn("two.md (2 blocks)", report)
+        self.assertIn("one.md#0 heading: # One", report)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+from markdown import BlockCache, markdown_to_html
+from search import ROOT_SECTION, SearchCollector, SearchIndex, extract_search_entry, page_section
+
+class TestExtractSearchEntry(unittest.TestCase):
+    def test_title_headings_and_terms(self):
+        md = "## Intro\n\n# The **Main** Title\n\nSee [the docs](https://example.com/guide) and ![a chart](chart.png).\n\n" \
+            "- the snake_case name\n\n```\nhidden code\n```"
+        entry = extract_search_entry(md)
+        self.assertEqual("The Main Title", entry["title"])
+        self.assertListEqual(["Intro", "The Main Title"], entry["headings"])
+        self.assertEqual(3, entry["terms"]["the"])
+        self.assertEqual(1, entry["terms"]["chart"])
+        self.assertEqual(1, entry["terms"]["snake"])
+        for term in ("https", "example", "guide", "png", "hidden", "code"):
+            self.assertNotIn(term, entry["terms"])
+
+    def test_terms_skip_code_spans_not_text(self):
+        md = "Run `x](y) spanword` then keep \\[these](words) and [link text](url) here"
+        terms = extract_search_entry(md)["terms"]
+        for term in ("run", "then", "keep", "these", "words", "link", "text", "here"):
+            self.assertIn(term, terms)
+        for term in ("spanword", "url"):
+            self.assertNotIn(term, terms)
+        self.assertNotIn("runthen", terms)
+
+    def test_title_falls_back_to_first_heading(self):
+        self.assertEqual("Sub", extract_search_entry("text\n\n### Sub")["title"])
+        self.assertEqual("", extract_search_entry("text only")["title"])
+
+    def test_collected_while_rendering(self):
+        md = "## Intro\n\n# The **Main** Title\n\n> quoted `code` words\n\n1. first [item](url)\n2. second\n\n" \
+            "```\nhidden code\n```\n\nRun `x` twice, run"
+        cache = BlockCache()
+        for _ in range(2):
+            search = SearchCollector()
+            self.assertEqual(markdown_to_html(md), markdown_to_html(md, cache, search=search))
+            self.assertEqual(extract_search_entry(md), search.entry())
+        self.assertEqual(5, cache.hits)
+        cache.summaries.clear()
+        search = SearchCollector()
+        markdown_to_html(md, cache, search=search)
+        self.assertEqual(extract_search_entry(md), search.entry())
+        self.assertEqual(2, search.entry()["terms"]["run"])
+
+
+class TestSearchIndex(unittest.TestCase):
+    def test_page_section(self):
+        self.assertEqual("blog", page_section(os.path.join("blog", "2024", "post.md")))
+        self.assertEqual(ROOT_SECTION, page_section("index.md"))
+        self.assertEqual("__root", page_section(os.path.join("_root", "page.md")))
+        self.assertEqual("__drafts", page_section(os.path.join("_drafts", "page.md")))
+
+    def test_shard_postings(self):
+        index = SearchIndex()
+        index.update("blog/b.md", {"title": "B", "headings": ["B"], "terms": {"b": 1, "shared": 2}})
+        index.update("blog/a.md", {"title": "A", "headings": [], "terms": {"shared": 1}})
+        index.update("index.md", {"title": "Home", "headings": [], "terms": {"home": 1}})
+        shard = index.shard("blog")
+        self.assertListEqual([{"url": "blog/a.html", "title": "A", "headings": []},
+            {"url": "blog/b.html", "title": "B", "headings": ["B"]}], shard["pages"])
+        self.assertDictEqual({"b": [1, 1], "shared": [0, 1, 1, 2]}, shard["postings"])
+
+    def test_write_shards_only_changed_sections(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            search_dir = os.path.join(temp_dir, "search")
+            state_path = os.path.join(temp_dir, "search.json")
+            index = SearchIndex()
+            index.update("blog/a.md", {"title": "A", "headings": [], "terms": {"a": 1}})
+            index.update("docs/d.md", {"title": "D", "headings": [], "terms": {"d": 1}})
+            index.write_shards(search_dir)
+            index.save(state_path)
+            self.assertListEqual(["blog.json", "docs.json"], sorted(os.listdir(search_dir)))
+            os.utime(os.path.join(search_dir, "docs.json"), ns=(1, 1))
+
+            index = SearchIndex.load(state_path)
+            index.update("docs/d.md", {"title": "D", "headings": [], "terms": {"d": 1}})
+            index.remove("blog/a.md")
+            index.write_shards(search_dir)
+            self.assertListEqual(["docs.json"], os.listdir(search_dir))
+            self.assertEqual(1, os.stat(os.path.join(search_dir, "docs.json")).st_mtime_ns)
+
+if __name__ == "__main__":
+    unittest.main()
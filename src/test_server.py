@@ -0,0 +1,231 @@
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.request
+from unittest import mock
+
+from server import DevSite, INOTIFY_EVENT, IN_Q_OVERFLOW, InotifyWatcher, PollingWatcher, collect_changes, \
+    inject_live_reload, make_server
+
+class FakeWatcher:
+    def __init__(self, batches):
+        self.batches = list(batches)
+
+    def wait(self, timeout):
+        return self.batches.pop(0) if self.batches else set()
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.content_dir = os.path.join(self.temp_dir.name, "content")
+        self.out_dir = os.path.join(self.temp_dir.name, "public")
+        os.makedirs(self.content_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_page(self, path, source):
+        full_path = os.path.join(self.content_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as page_file:
+            page_file.write(source)
+        return full_path
+
+    def test_collect_changes_debounces(self):
+        watcher = FakeWatcher([{"a.md"}, {"a.md", "b.md"}, set(), {"c.md"}])
+        self.assertSetEqual({"a.md", "b.md"}, collect_changes(watcher, timeout=1))
+        self.assertSetEqual({"c.md"}, collect_changes(watcher, timeout=1))
+
+    def test_polling_watcher(self):
+        other_dir = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(other_dir)
+        watcher = PollingWatcher(self.content_dir, other_dir, interval=0.01)
+        path = self.write_page("page.md", "# Page")
+        self.assertSetEqual({path}, watcher.wait(1))
+        other = os.path.join(other_dir, "page.html")
+        with open(other, "w") as template_file:
+            template_file.write("{{ content }}")
+        self.assertSetEqual({other}, watcher.wait(1))
+        os.remove(path)
+        self.assertSetEqual({path}, watcher.wait(1))
+        self.assertSetEqual(set(), watcher.wait(0))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is linux only")
+    def test_inotify_watcher(self):
+        watcher = InotifyWatcher(self.content_dir)
+        try:
+            path = self.write_page("page.md", "# Page")
+            self.assertIn(path, collect_changes(watcher, timeout=1))
+            nested = self.write_page(os.path.join("blog", "post.md"), "# Post")
+            self.assertIn(nested, collect_changes(watcher, timeout=1))
+            with open(nested, "a") as page_file:
+                page_file.write("\n\nmore")
+            self.assertSetEqual({nested}, collect_changes(watcher, timeout=1))
+        finally:
+            watcher.close()
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is linux only")
+    def test_inotify_watcher_follows_moved_directories(self):
+        moved = os.path.join(self.temp_dir.name, "moved")
+        blog = os.path.join(self.content_dir, "blog")
+        self.write_page(os.path.join("blog", "post.md"), "# Post")
+        watcher = InotifyWatcher(self.content_dir)
+        try:
+            os.rename(blog, moved)
+            self.assertSetEqual({blog}, collect_changes(watcher, timeout=1))
+            self.assertNotIn(blog, watcher.directories.values())
+            with open(os.path.join(moved, "post.md"), "a") as page_file:
+                page_file.write("\n\nmore")
+            self.assertSetEqual(set(), collect_changes(watcher, timeout=0.1))
+            os.rename(moved, blog)
+            self.assertSetEqual({os.path.join(blog, "post.md")}, collect_changes(watcher, timeout=1))
+            self.assertIn(blog, watcher.directories.values())
+        finally:
+            watcher.close()
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is linux only")
+    def test_inotify_watcher_rescans_after_overflow(self):
+        watcher = InotifyWatcher(self.content_dir)
+        other_dir = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(other_dir)
+        watcher.watch(other_dir, self.content_dir)
+        try:
+            nested = os.path.join(self.content_dir, "blog")
+            os.makedirs(nested)
+            overflow = INOTIFY_EVENT.pack(-1, IN_Q_OVERFLOW, 0, 0)
+            with mock.patch("select.select", return_value=([watcher.fd], [], [])), \
+                    mock.patch("os.read", return_value=overflow):
+                self.assertSetEqual({self.content_dir, other_dir}, watcher.wait(1))
+            self.assertIn(nested, watcher.directories.values())
+        finally:
+            watcher.close()
+
+    def test_polling_watcher_adds_directories(self):
+        watcher = PollingWatcher(self.content_dir, interval=0.01)
+        other_dir = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(other_dir)
+        existing = os.path.join(other_dir, "page.html")
+        with open(existing, "w") as template_file:
+            template_file.write("{{ content }}")
+        watcher.watch(other_dir, self.content_dir)
+        self.assertSetEqual(set(), watcher.wait(0))
+        os.utime(existing, ns=(1, 1))
+        self.assertSetEqual({existing}, watcher.wait(1))
+
+    def test_rebuild_changed_directories(self):
+        self.write_page("a.md", "# A")
+        post = self.write_page(os.path.join("blog", "post.md"), "# Post")
+        site = DevSite(self.content_dir, self.out_dir)
+        self.assertListEqual(["a.html", os.path.join("blog", "post.html")], site.rebuild({self.content_dir}))
+        blog = os.path.dirname(post)
+        os.rename(blog, os.path.join(self.temp_dir.name, "moved"))
+        self.assertListEqual([os.path.join("blog", "post.html")], site.rebuild({blog}))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "blog", "post.html")))
+        self.assertSetEqual({"a.md"}, site.pages)
+
+    def test_template_dirs_follow_recompiled_template(self):
+        template_path = os.path.join(self.temp_dir.name, "page.html")
+        with open(template_path, "w") as template_file:
+            template_file.write("{{ content }}")
+        site = DevSite(self.content_dir, self.out_dir, template_path)
+        self.assertListEqual([self.temp_dir.name], site.template_dirs())
+        partial_dir = os.path.join(self.temp_dir.name, "partials")
+        os.makedirs(partial_dir)
+        with open(os.path.join(partial_dir, "footer.html"), "w") as footer_file:
+            footer_file.write("<footer></footer>")
+        with open(template_path, "w") as template_file:
+            template_file.write("{{ content }}{{> partials/footer.html }}")
+        os.utime(template_path, ns=(1, 1))
+        site.rebuild({template_path})
+        self.assertListEqual([self.temp_dir.name, partial_dir], site.template_dirs())
+
+    def test_rebuild_only_changed_pages(self):
+        site = DevSite(self.content_dir, self.out_dir)
+        path = self.write_page(os.path.join("blog", "post.md"), "# Post")
+        self.write_page("other.md", "# Other")
+        rebuilt = site.rebuild({path, os.path.join(self.content_dir, "notes.txt")})
+        self.assertListEqual([os.path.join("blog", "post.html")], rebuilt)
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "other.html")))
+        self.assertEqual(1, site.generation)
+
+        os.remove(path)
+        self.assertListEqual([os.path.join("blog", "post.html")], site.rebuild({path}))
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "blog", "post.html")))
+
+    def test_rebuild_with_template(self):
+        template_path = os.path.join(self.temp_dir.name, "page.html")
+        with open(template_path, "w") as template_file:
+            template_file.write("<title>{{ title }}</title>{{ content }}")
+        site = DevSite(self.content_dir, self.out_dir, template_path)
+        path = self.write_page("post.md", "# Post")
+        site.rebuild({path})
+        with open(os.path.join(self.out_dir, "post.html")) as html_file:
+            self.assertEqual("<title>Post</title><div><h1>Post</h1></div>", html_file.read())
+
+    def test_template_change_rewrites_every_page(self):
+        template_dir = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(template_dir)
+        template_path = os.path.join(template_dir, "page.html")
+        with open(template_path, "w") as template_file:
+            template_file.write("{{ content }}{{> footer.html }}")
+        footer_path = os.path.join(template_dir, "footer.html")
+        with open(footer_path, "w") as footer_file:
+            footer_file.write("<footer></footer>")
+        site = DevSite(self.content_dir, self.out_dir, template_path)
+        self.assertListEqual([template_dir], site.template_dirs())
+        pages = [self.write_page("a.md", "# A"), self.write_page(os.path.join("blog", "b.md"), "# B")]
+        site.rebuild(pages)
+        self.assertListEqual([], site.rebuild({footer_path}))
+
+        with open(footer_path, "w") as footer_file:
+            footer_file.write("<footer>new</footer>")
+        os.utime(footer_path, ns=(1, 1))
+        self.assertListEqual(["a.html", os.path.join("blog", "b.html")], site.rebuild({footer_path}))
+        with open(os.path.join(self.out_dir, "blog", "b.html")) as html_file:
+            self.assertEqual("<div><h1>B</h1></div><footer>new</footer>", html_file.read())
+
+    def test_rebuild_reports_failed_pages(self):
+        site = DevSite(self.content_dir, self.out_dir)
+        bad = self.write_page("bad.md", "# Bad")
+        good = self.write_page("good.md", "# Good")
+        with mock.patch("server.markdown_to_html", side_effect=[ValueError("render failed"), "<div></div>"]), \
+                mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            self.assertListEqual(["good.html"], site.rebuild({bad, good}))
+        self.assertIn("bad.md: render failed", stderr.getvalue())
+
+        with mock.patch("sys.stderr", new_callable=io.StringIO) as stderr:
+            site.rebuild({self.write_page("good.md", "# Good\n\nnot **closed")})
+        self.assertEqual('good.md:3:5: Encountered unpaired "**" delimiter\n', stderr.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.out_dir, "bad.html")))
+
+    def test_inject_live_reload(self):
+        self.assertTrue(inject_live_reload("<div></div>", 3).startswith("<div></div><script>"))
+        html = inject_live_reload("<html><body><p>x</p></body></html>", 3)
+        self.assertTrue(html.endswith("</script></body></html>"))
+        self.assertIn("})(3);", html)
+
+    def test_server_serves_and_reloads(self):
+        site = DevSite(self.content_dir, self.out_dir)
+        site.rebuild({self.write_page("index.md", "# Home")})
+        server = make_server(site, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            with urllib.request.urlopen(f"{base_url}/") as response:
+                html = response.read().decode()
+            self.assertTrue(html.startswith("<div><h1>Home</h1></div><script>"))
+
+            site.rebuild({self.write_page("index.md", "# Changed")})
+            with urllib.request.urlopen(f"{base_url}/__livereload?generation=1") as response:
+                self.assertEqual("2", response.read().decode())
+            with urllib.request.urlopen(f"{base_url}/__livereload?generation=1&x=1") as response:
+                self.assertEqual("2", response.read().decode())
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    unittest.main()
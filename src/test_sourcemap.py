@@ -0,0 +1,57 @@
+import unittest
+
+from markdown import markdown_to_html
+from sourcemap import LineIndex, line_positions, render_with_source_map, source_map_json
+
+class TestLineIndex(unittest.TestCase):
+    def test_position(self):
+        index = LineIndex("ab\ncd\n\ne")
+        self.assertEqual((1, 1), index.position(0))
+        self.assertEqual((1, 3), index.position(2))
+        self.assertEqual((2, 2), index.position(4))
+        self.assertEqual((3, 1), index.position(6))
+        self.assertEqual((4, 1), index.position(7))
+
+    def test_splits_lines_like_splitlines(self):
+        source = "a\rb\r\nc\x0bd\u2028e\nf"
+        index = LineIndex(source)
+        lines = source.splitlines(keepends=True)
+        self.assertEqual(len(lines), len(index.line_starts))
+        self.assertEqual((5, 1), index.position(source.index("e")))
+        self.assertListEqual([(2, 1), (5, 1)], line_positions(["a\rb\r\n", "c\x0bd\u2028e\n", "f"],
+            [source.index("b"), source.index("e")]))
+
+    def test_span(self):
+        index = LineIndex("ab\ncd")
+        self.assertEqual((1, 2, 2, 2), index.span(1, 5))
+        self.assertEqual((1, 1, 1, 1), index.span(0, 0))
+
+
+class TestRenderWithSourceMap(unittest.TestCase):
+    def test_matches_markdown_to_html(self):
+        md = "# Title\n\n  Some **bold\ntext**\n\n- a\n- b\n\n```\nx\n```\n"
+        html, source_map = render_with_source_map(md, "page.md")
+        self.assertEqual(markdown_to_html(md), html)
+        self.assertEqual("page.md", source_map["source"])
+        self.assertListEqual(["<h1>Title</h1>", "<p>Some <b>bold text</b></p>", "<ul><li>a</li><li>b</li></ul>",
+            "<pre><code>x\n</code></pre>"], [html[slice(*block["html"])] for block in source_map["blocks"]])
+        self.assertListEqual([[1, 1, 1, 7], [3, 3, 4, 6], [6, 1, 7, 3], [9, 1, 11, 3]],
+            [block["source"] for block in source_map["blocks"]])
+        self.assertListEqual([], source_map["errors"])
+
+    def test_errors_have_positions(self):
+        md = "Intro\n\n- a **b\n- c `d\n\n  x _y"
+        _, source_map = render_with_source_map(md)
+        self.assertListEqual([
+            {"line": 3, "column": 5, "message": 'Encountered unpaired "**" delimiter'},
+            {"line": 4, "column": 5, "message": 'Encountered unpaired "`" delimiter'},
+            {"line": 6, "column": 5, "message": 'Encountered unpaired "_" delimiter'},
+        ], source_map["errors"])
+
+    def test_source_map_json(self):
+        _, source_map = render_with_source_map("a")
+        self.assertEqual('{"version":1,"source":null,"blocks":[{"html":[5,13],"source":[1,1,1,1]}],"errors":[]}',
+            source_map_json(source_map))
+
+if __name__ == "__main__":
+    unittest.main()
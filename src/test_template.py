@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from template import TemplateCache, compile_template, extract_title
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_template(self, name, text):
+        path = os.path.join(self.temp_dir.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as template_file:
+            template_file.write(text)
+        return path
+
+    def render(self, template, title, html):
+        chunks = []
+        template.render(chunks.append, title, lambda write: write(html))
+        return "".join(chunks)
+
+    def test_compile_to_literals_and_slots(self):
+        path = self.write_template("page.html", "<title>{{ title }}</title><main>{{content}}</main>")
+        template = compile_template(path)
+        self.assertListEqual(["<title>", "</title><main>", "</main>"], template.literals)
+        self.assertListEqual(["title", "content"], template.slots)
+        self.assertEqual("<title>A &amp; B</title><main><p>x</p></main>", self.render(template, "A & B", "<p>x</p>"))
+        self.assertEqual(len("<title>A &amp; B</title><main>"), template.content_offset("A & B"))
+
+    def test_partials_are_spliced_in(self):
+        self.write_template(os.path.join("partials", "footer.html"), "<footer>{{ title }}</footer>")
+        self.write_template(os.path.join("partials", "body.html"), "<main>{{ content }}</main>{{> footer.html }}")
+        path = self.write_template("page.html", "<h1>{{ title }}</h1>{{> partials/body.html }}\n")
+        template = compile_template(path)
+        self.assertListEqual(["<h1>", "</h1><main>", "</main><footer>", "</footer>\n"], template.literals)
+        self.assertEqual("<h1>T</h1><main>body</main><footer>T</footer>\n", self.render(template, "T", "body"))
+        self.assertEqual(3, len(template.dependencies))
+
+    def test_errors(self):
+        path = self.write_template("page.html", "{{ author }}")
+        with self.assertRaisesRegex(ValueError, "Unknown template slot 'author'"):
+            compile_template(path)
+        self.write_template("a.html", "{{> b.html }}")
+        path = self.write_template("b.html", "{{> a.html }}")
+        with self.assertRaisesRegex(ValueError, "includes itself"):
+            compile_template(path)
+
+    def test_cache_recompiles_changed_templates(self):
+        partial = self.write_template("footer.html", "<footer></footer>")
+        path = self.write_template("page.html", "{{ content }}{{> footer.html }}")
+        cache = TemplateCache()
+        template = cache.get(path)
+        self.assertIs(template, cache.get(path))
+
+        self.write_template("footer.html", "<footer>new</footer>")
+        os.utime(partial, ns=(1, 1))
+        updated = cache.get(path)
+        self.assertIsNot(template, updated)
+        self.assertEqual("x<footer>new</footer>", self.render(updated, "", "x"))
+
+    def test_extract_title(self):
+        self.assertEqual("Hello world", extract_title("Intro\n\n## Sub\n\n# Hello _world_\n\n# Second"))
+        self.assertEqual("Only a subheading", extract_title("## Only a subheading\n\n### Another"))
+        self.assertEqual("", extract_title("No headings"))
+        self.assertEqual("Lines", extract_title(iter(["# Lines\n", "\n", "text\n"])))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 import unittest
 
-from textnode import TextNode, TextType
+from textnode import TextNode, TextType, TEXT_TO_HTML_NODE
 
 
 class TestTextNode(unittest.TestCase):
@@ -73,5 +73,17 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(html_node.value, "")
         self.assertDictEqual(html_node.props, {"src": url, "alt": value})
 
+    def test_every_type_has_html_node(self):
+        self.assertSetEqual(set(TextType), set(TEXT_TO_HTML_NODE))
+
+    def test_unknown_type_to_html(self):
+        node = TextNode("This is a text node", "underline")
+        self.assertRaises(Exception, node.to_html_node)
+
+    def test_no_instance_dict(self):
+        node = TextNode("This is a text node", TextType.LINK, "https://www.boot.dev")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual("TextNode(This is a text node, link, https://www.boot.dev)", repr(node))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -8,13 +8,26 @@ class TextType(Enum):
     CODE = "code"
     LINK = "link"
     IMAGE = "image"
+    BOLD_ITALIC = "bold_italic"
 
+    # Enum.__hash__ is written in Python and hashes the member name on every
+    # dict lookup. Members are singletons compared by identity, so the
+    # identity hash gives the same answers at C speed.
+    __hash__ = object.__hash__
 
+
+# span is the (start, end) offsets of the text in what the parser read:
+# the inline text or block for text_to_textnodes, the source for a
+# FlatDocument. It is None for nodes made by hand, and it does not take
+# part in equality.
 class TextNode:
-    def __init__(self, text, text_type, url = None):
+    __slots__ = ("text", "text_type", "url", "span")
+
+    def __init__(self, text, text_type, url = None, span = None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        self.span = span
 
     def __eq__(self, other):
         return self.text == other.text \
@@ -25,17 +38,18 @@ class TextNode:
         return f'TextNode({self.text}, {self.text_type.value}, {self.url})'
     
     def to_html_node(self):
-        if self.text_type == TextType.TEXT:
-            return LeafNode(None, self.text)
-        elif self.text_type == TextType.BOLD:
-            return LeafNode("b", self.text)
-        elif self.text_type == TextType.ITALIC:
-            return LeafNode("i", self.text)
-        elif self.text_type == TextType.CODE:
-            return LeafNode("code", self.text)
-        elif self.text_type == TextType.LINK:
-            return LeafNode("a", self.text, {"href": self.url})
-        elif self.text_type == TextType.IMAGE:
-            return LeafNode("img", "", {"src": self.url, "alt": self.text})
-        else:
-            raise Exception(f'Unexpected text type: {self.text_type}')
\ No newline at end of file
+        to_html_node = TEXT_TO_HTML_NODE.get(self.text_type)
+        if to_html_node is None:
+            raise Exception(f'Unexpected text type: {self.text_type}')
+        return to_html_node(self)
+
+
+TEXT_TO_HTML_NODE = {
+    TextType.TEXT: lambda node: LeafNode(None, node.text),
+    TextType.BOLD: lambda node: LeafNode("b", node.text),
+    TextType.ITALIC: lambda node: LeafNode("i", node.text),
+    TextType.BOLD_ITALIC: lambda node: ParentNode("b", [LeafNode("i", node.text)]),
+    TextType.CODE: lambda node: LeafNode("code", node.text),
+    TextType.LINK: lambda node: LeafNode("a", node.text, {"href": node.url}),
+    TextType.IMAGE: lambda node: LeafNode("img", "", {"src": node.url, "alt": node.text}),
+}